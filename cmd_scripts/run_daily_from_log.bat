@@ -1,9 +1,7 @@
 @echo off
-cd /d %~dp0
-echo Processing log file...
-python scripts/process_log.py
-echo Building daily report...
-python scripts/build_report.py
+cd /d %~dp0..
+echo Processing log file and building daily reports...
+python scripts/report_worker.py daily
 echo.
 echo Daily report generation complete.
 pause 
\ No newline at end of file
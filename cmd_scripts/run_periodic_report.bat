@@ -1,5 +1,5 @@
 @echo off
-cd /d %~dp0
+cd /d %~dp0..
 
 REM This script generates a periodic report.
 REM It can be run with an argument: run_periodic_report.bat [period]
@@ -21,7 +21,7 @@ if not defined period (
 
 :run_script
 echo Generating %period% report...
-python scripts/generate_periodic_report.py --period %period%
+python scripts/report_worker.py period --period %period%
 
 echo.
 echo Periodic report generation complete.
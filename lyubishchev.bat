@@ -0,0 +1,2 @@
+@echo off
+python "%~dp0scripts\lyubishchev.py" %*
\ No newline at end of file
@@ -0,0 +1,229 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import build_report
+import generate_periodic_report
+import history_cache
+import history_search
+import history_store
+import process_log
+import synthetic_data
+import templating
+
+# 预设的规模：历史年数 × 每天的子项数，每种组合是一个测试用例
+SCALES = {
+    'quick': {'years': [1], 'items': [10]},
+    'realistic': {'years': [1, 5], 'items': [10, 50]},
+    'extreme': {'years': [1, 5, 20], 'items': [10, 100, 500]},
+}
+RESULTS_DIR = 'data/benchmarks'
+# 日志解析测试使用的日志天数
+LOG_DAYS = 30
+# 周期报告测试使用的周期长度（历史数据的最后若干天）
+PERIOD_DAYS = 30
+
+
+def get_project_root():
+    """项目根目录（scripts 的上一级）。"""
+    return os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
+
+def measure(func, repeat):
+    """运行 func repeat 次（不输出任何内容），返回以毫秒计的耗时统计。"""
+    samples = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "repeat": repeat,
+    }
+
+def prepare_workspace(workdir):
+    """在工作目录中准备 templates/、data/ 和 reports/，所有测试都在其中进行，不会改动项目的数据。"""
+    templates_dir = os.path.join(workdir, 'templates')
+    if not os.path.isdir(templates_dir):
+        shutil.copytree(os.path.join(get_project_root(), 'templates'), templates_dir)
+    os.makedirs(os.path.join(workdir, 'data'), exist_ok=True)
+    os.makedirs(os.path.join(workdir, 'reports'), exist_ok=True)
+
+def history_db(years, items, seed):
+    """返回（必要时生成）某个规模的合成历史库；工作目录被复用时已生成的库不会重新生成。"""
+    db_file = os.path.join('data', f'history-{years}y-{items}i-{seed}.db')
+    if not os.path.exists(db_file):
+        synthetic_data.generate_history(db_file, years, items, seed=seed)
+    return db_file
+
+def run_case(years, items, repeat, seed=0):
+    """对一种规模运行全部测试，返回该用例的结果字典。"""
+    timings = {}
+    setup_start = time.perf_counter()
+    db_file = history_db(years, items, seed)
+    setup_ms = (time.perf_counter() - setup_start) * 1000
+    with contextlib.closing(history_store.connect(db_file, csv_file=None)) as conn:
+        records = conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        last_date = conn.execute("SELECT MAX(date) FROM records").fetchone()[0]
+
+    # --- 日志解析 ---
+    day_log = synthetic_data.generate_log(1, items, seed=seed)
+    month_log = synthetic_data.generate_log(LOG_DAYS, items, seed=seed)
+    timings['parse_log_content[1 day]'] = measure(lambda: process_log.parse_log_content(day_log), repeat)
+    timings[f'parse_log_days[{LOG_DAYS} days]'] = measure(lambda: process_log.parse_log_days(month_log), repeat)
+
+    # --- 写入一天（重复替换历史中的最后一天，保持数据不变） ---
+    summary_data, _ = process_log.parse_log_content(day_log)
+    log_date = datetime.datetime.strptime(last_date, '%Y-%m-%d')
+    timings['append_to_csv'] = measure(lambda: process_log.append_to_csv(summary_data, log_date, db_file), repeat)
+
+    # --- 每日报告的趋势数据 ---
+    timings['prepare_historical_data[auto]'] = measure(
+        lambda: build_report.prepare_historical_data(db_file, 'auto'), repeat)
+    timings['prepare_historical_data[day]'] = measure(
+        lambda: build_report.prepare_historical_data(db_file, 'day'), repeat)
+
+    # --- 周期报告的数据准备 ---
+    end_date = log_date.date()
+    start_date = end_date - datetime.timedelta(days=PERIOD_DAYS - 1)
+    cache_base = os.path.join('data', f'history-{years}y-{items}i-{seed}.cache')
+
+    def load_history_cold():
+        history_cache._memory_cache.clear()
+        for suffix in ('.json', '.parquet', '.pkl'):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(cache_base + suffix)
+        history_cache.load_history(start=start_date, end=end_date, db_file=db_file, cache_base=cache_base)
+
+    timings['load_history[cold]'] = measure(load_history_cold, max(1, repeat // 3))
+    timings['load_history[warm]'] = measure(
+        lambda: history_cache.load_history(start=start_date, end=end_date, db_file=db_file, cache_base=cache_base), repeat)
+
+    period_df = history_cache.load_history(start=start_date, end=end_date, db_file=db_file, cache_base=cache_base)
+    item_totals_df = history_cache.load_item_totals(start_date, end_date, db_file=db_file)
+    trend_df, trend_bucket = history_cache.load_trend_rollup('auto', db_file=db_file)
+    timings['prepare_chart_and_pie_data'] = measure(
+        lambda: generate_periodic_report.prepare_chart_and_pie_data(period_df), repeat)
+    timings['prepare_stacked_bar_data'] = measure(
+        lambda: generate_periodic_report.prepare_stacked_bar_data(item_totals_df), repeat)
+    timings['prepare_historical_data_from_df'] = measure(
+        lambda: generate_periodic_report.prepare_historical_data_from_df(trend_df.copy(), trend_bucket), repeat)
+
+    # --- 全文搜索（三个字符以上的词走索引，更短的词逐条扫描） ---
+    timings['search[indexed]'] = measure(lambda: history_search.search('看视频', db_file=db_file), repeat)
+    timings['search[scan]'] = measure(lambda: history_search.search('琐事', db_file=db_file), repeat)
+
+    # --- 模板渲染（写入工作目录的 reports/） ---
+    historical_data = build_report.prepare_historical_data(db_file, 'auto')
+    # 模板编译只发生一次，不计入渲染耗时
+    templating.get_report_template()
+    timings['render_daily_report'] = measure(
+        lambda: build_report.render_daily_report(summary_data, historical_data), repeat)
+
+    return {
+        "years": years,
+        "items": items,
+        "records": records,
+        "setup_ms": round(setup_ms, 3),
+        "timings": timings,
+    }
+
+def git_commit():
+    """当前代码的 git 提交（不在 git 仓库中时返回 None）。"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=get_project_root(),
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+def compare(results, previous):
+    """打印与上一次结果的对比（按中位数）。"""
+    previous_cases = {(case['years'], case['items']): case for case in previous.get('cases', [])}
+    for case in results['cases']:
+        old_case = previous_cases.get((case['years'], case['items']))
+        if old_case is None:
+            continue
+        print(f"\n{case['years']} 年 × {case['items']} 个子项（对比 {previous.get('commit') or previous.get('created')}）:")
+        for name, timing in case['timings'].items():
+            old = old_case['timings'].get(name)
+            if not old or not old['median_ms']:
+                continue
+            ratio = timing['median_ms'] / old['median_ms']
+            print(f"  {name:<36}{old['median_ms']:>10.2f} ms -> {timing['median_ms']:>10.2f} ms  ({ratio:.2f}x)")
+
+def print_case(case):
+    """打印一个用例的结果。"""
+    print(f"\n{case['years']} 年 × {case['items']} 个子项，共 {case['records']} 条记录:")
+    for name, timing in case['timings'].items():
+        print(f"  {name:<36}{timing['median_ms']:>10.2f} ms  (最快 {timing['min_ms']:.2f} ms)")
+
+def main():
+    """命令行入口：用合成数据测量解析、写入、数据准备和渲染的耗时，并把结果保存为JSON。"""
+    parser = argparse.ArgumentParser(description="用合成的日志和历史数据测量报告流程各环节的耗时。")
+    parser.add_argument('--scale', choices=SCALES, default='realistic', help="预设的数据规模。")
+    parser.add_argument('--years', type=int, nargs='+', help="历史年数（覆盖 --scale 的设置）。")
+    parser.add_argument('--items', type=int, nargs='+', help="每天的子项数（覆盖 --scale 的设置）。")
+    parser.add_argument('--repeat', type=int, default=5, help="每项测试的重复次数。")
+    parser.add_argument('--seed', type=int, default=0, help="合成数据的随机种子。")
+    parser.add_argument('--workdir', type=str,
+                        help="工作目录；指定后生成的历史库会保留下来供下次复用，默认使用临时目录。")
+    parser.add_argument('--output', type=str, help=f"结果JSON的路径，默认保存到 {RESULTS_DIR}/。")
+    parser.add_argument('--compare', type=str, help="与之前保存的结果JSON进行对比。")
+    args = parser.parse_args()
+
+    years_list = args.years or SCALES[args.scale]['years']
+    items_list = args.items or SCALES[args.scale]['items']
+    created = datetime.datetime.now()
+    output_file = os.path.abspath(args.output or os.path.join(
+        get_project_root(), RESULTS_DIR, f"benchmark-{created.strftime('%Y%m%d-%H%M%S')}.json"))
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+
+    results = {
+        "created": created.strftime('%Y-%m-%d %H:%M:%S'),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "cases": [],
+    }
+
+    with contextlib.ExitStack() as stack:
+        workdir = args.workdir or stack.enter_context(tempfile.TemporaryDirectory(prefix='lyubishchev-bench-'))
+        os.makedirs(workdir, exist_ok=True)
+        prepare_workspace(workdir)
+        cwd = os.getcwd()
+        # 报告流程使用相对路径 (data/, reports/, templates/)，在工作目录中运行
+        os.chdir(workdir)
+        stack.callback(os.chdir, cwd)
+        for years in years_list:
+            for items in items_list:
+                print(f"正在测试 {years} 年 × {items} 个子项 ...", flush=True)
+                case = run_case(years, items, args.repeat, args.seed)
+                results['cases'].append(case)
+                print_case(case)
+
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    if previous is not None:
+        compare(results, previous)
+    print(f"--> {output_file}")
+
+if __name__ == "__main__":
+    main()
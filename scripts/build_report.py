@@ -1,122 +1,33 @@
 import json
-from jinja2 import Environment, FileSystemLoader
 import datetime
-import pandas as pd
 import os
+import argparse
+import itertools
+from contextlib import closing
 
-def time_str_to_minutes(time_str):
-    """将'Xh Ym'或'Xh'或'Ym'格式的字符串转换为分钟。"""
-    hours = 0
-    minutes = 0
-    if not isinstance(time_str, str):
-        return 0
-    time_str = time_str.strip()
-    
-    if 'h' in time_str:
-        parts = time_str.split('h')
-        try:
-            hours = int(parts[0])
-        except ValueError:
-            hours = 0
-        if parts[1] and 'm' in parts[1]:
-            try:
-                minutes = int(parts[1].replace('m', ''))
-            except (ValueError, IndexError):
-                minutes = 0
-    elif 'm' in time_str:
-        try:
-            minutes = int(time_str.replace('m', ''))
-        except ValueError:
-            minutes = 0
-            
-    return hours * 60 + minutes
-
-def minutes_to_time_str(minutes):
-    """将分钟数转换为'Xh Ym'格式的字符串。"""
-    if minutes is None or minutes < 0:
-        return "0m"
-    if minutes == 0:
-        return "0m"
-    hours = minutes // 60
-    mins = minutes % 60
-    result = ''
-    if hours > 0:
-        result += f"{hours}h"
-    if mins > 0:
-        result += ('' if result == '' else ' ') + f"{mins}m"
-    return result
+import history_store
+import process_log
+import report_assets
+import report_manifest
+import report_options
+import templating
+import timing
+from report_data import (
+    CATEGORY_COLORS, build_hierarchy, calendar_data, downsample_columns, history_columns, hour_heatmap,
+    summary_to_dataframe, time_str_to_minutes
+)
 
 def prepare_data_for_template(data):
     """将摘要数据转换为新模板所需的丰富格式。"""
-    
-    # 为类别定义颜色
-    colors = {
-        '第一类': '#3498db',  # 蓝色
-        '第二类': '#2ecc71',  # 绿色
-        '根源': '#9b59b6',   # 紫色
-        '娱乐': '#f1c40f',   # 黄色
-        '杂项': '#e74c3c',    # 红色
-        'default': '#7f8c8d'  # 灰色
-    }
-
-    chart_data = []
-    pie_data = []
-    summary = data.get("daily_summary", {})
-    details = data.get("daily_details", {})
-    
-    # 按照在颜色字典中定义的顺序排序，以确保颜色稳定
-    sorted_categories = sorted(summary.keys(), key=lambda x: list(colors.keys()).index(x) if x in colors else 99)
-
-    for category in sorted_categories:
-        items = summary[category]
-        if category == "总计":
-            continue
-            
-        category_total_minutes = time_str_to_minutes(items.get("总计", "0m"))
-        color = colors.get(category, colors['default'])
-
-        # 准备子类别数据 (旭日图的第二层)
-        children = []
-        category_details = details.get(category, {})
-        for item, time_str in items.items():
-            if item != "总计":
-                item_minutes = time_str_to_minutes(time_str)
-                
-                # 准备任务数据 (旭日图的第三层)
-                tasks_children = []
-                if item in category_details:
-                    for task in category_details[item]:
-                        task_minutes = time_str_to_minutes(task['time'])
-                        tasks_children.append({
-                            "name": task['task'],
-                            "value": task_minutes,
-                            "time_str": minutes_to_time_str(task_minutes)
-                        })
-
-                children.append({
-                    "name": item,
-                    "value": item_minutes,
-                    "value_str": minutes_to_time_str(item_minutes),
-                    "children": tasks_children
-                })
-        
-        # 准备旭日图和卡片的数据
-        chart_data.append({
-            "name": category,
-            "value": category_total_minutes,
-            "value_str": minutes_to_time_str(category_total_minutes),
-            "itemStyle": {"color": color},
-            "children": children
-        })
-        
-        # 准备饼图数据
-        pie_data.append({
-            "name": category,
-            "value": category_total_minutes,
-            "itemStyle": {"color": color}
-        })
-        
-    return chart_data, pie_data
+    # 按照在颜色字典中定义的顺序排序类别，以确保颜色稳定；子项和任务保持日志中的顺序
+    color_order = list(CATEGORY_COLORS.keys())
+    return build_hierarchy(
+        summary_to_dataframe(data),
+        sort_keys=False,
+        category_sort_key=lambda x: color_order.index(x) if x in color_order else 99,
+        sort_children_by_value=False,
+        use_color_list=False
+    )
 
 def prepare_stacked_bar_data(data):
     """为堆叠柱状图准备数据。"""
@@ -157,97 +68,286 @@ def prepare_stacked_bar_data(data):
         "series": series_data
     }
 
-def prepare_historical_data(csv_file):
-    """读取并处理历史数据CSV，为折线图准备数据。"""
-    if not os.path.exists(csv_file):
+@timing.timed('趋势数据')
+def prepare_historical_data(db_file, bucket='auto', points=None):
+    """
+    读取并处理历史数据，为折线图准备数据。
+    bucket 为趋势图的时间粒度（auto 时按历史跨度选择 日/周/月），points 为 LTTB 降采样的目标点数。
+    """
+    if not os.path.exists(db_file) and not os.path.exists(history_store.CSV_FILE):
         return None
 
-    try:
-        # 指定列名，以防旧文件格式不一致
-        col_names = ['Date', 'Category', 'Item', 'Task', 'Task Duration (minutes)']
-        df = pd.read_csv(csv_file)
-        df.columns = col_names[:len(df.columns)]
-
+    # pandas 只在真正需要渲染时才导入；报告未变化被跳过、--status 等路径不需要它
+    with timing.stage('导入 pandas'):
+        import history_cache
 
-        # 将日期字符串转换为datetime对象，并按日期排序
-        df['Date'] = pd.to_datetime(df['Date'])
-        df = df.sort_values('Date')
+    try:
+        # 直接读取预聚合的 日/周/月×类别 汇总，无需扫描全部原始记录
+        with timing.stage('读取预聚合表'):
+            df, bucket = history_cache.load_trend_rollup(bucket, db_file=db_file)
+        if df.empty:
+            return None
 
-        # 按日期和类别对时长进行分组求和
-        # 我们只关心Category的总和，所以Item和Task级别的数据直接聚合掉
-        pivot_df = df.pivot_table(index='Date', columns='Category', values='Task Duration (minutes)', aggfunc='sum').fillna(0)
-        
-        # 准备ECharts需要的数据格式
-        dates = pivot_df.index.strftime('%Y-%m-%d').tolist()
-        categories = pivot_df.columns.tolist()
-        
-        series = []
-        for category in categories:
-            series.append({
-                "name": category,
-                "type": 'line',
-                "data": pivot_df[category].tolist()
-            })
-            
-        return {"dates": dates, "categories": categories, "series": series}
+        # 按日期和类别汇总为列式数据：一个日期数组加上每个类别一列整数
+        with timing.stage('整理趋势数据'):
+            columns = downsample_columns(history_columns(df, bucket), points)
+        # 作息热力图直接由保存好的打点时间数组统计，不需要重新解析日志
+        with timing.stage('作息热力图'):
+            heatmap = hour_heatmap(history_cache.load_timelines(db_file=db_file))
+        if heatmap:
+            columns['hour_heatmap'] = heatmap
+        # 年度日历热力图：一次读取 日×类别 汇总，在同一遍遍历中按年、按类别整理，不按年分别查询
+        with timing.stage('日历热力图'):
+            calendar = calendar_data(history_cache.load_daily_category_totals(db_file=db_file))
+        if calendar:
+            columns['calendar'] = calendar
+        return columns
     except Exception as e:
         print(f"处理历史数据时出错: {e}")
         return None
 
-def main():
-    """主函数：读取JSON，渲染并保存HTML报告。"""
-    json_file = 'data/summary.json'
-    template_file = 'new_report_template.html'
-    
-    try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            summary_data = json.load(f)
-    except FileNotFoundError:
-        print(f"错误: 未找到 '{json_file}'。请先运行 'process_log.py'。")
-        return
-    except json.JSONDecodeError:
-        print(f"错误: '{json_file}' 文件格式不正确。")
-        return
-
+def daily_report_path(summary_data):
+    """每日报告的输出路径。"""
     # 统一并动态生成输出文件名
+    date_str = summary_data.get("report_date") or datetime.datetime.now().strftime("%Y-%m-%d")
+    return f'reports/report-daily-{date_str}.html'
+
+def history_source(historical_data, data_mode):
+    """shared 模式下写出共享的历史数据文件并返回其引用地址；inline 模式返回 None。"""
+    if data_mode == 'shared' and historical_data:
+        return report_assets.write_history_data(historical_data)
+    return None
+
+def build_daily_report(summary_data, force=False, options=None):
+    """
+    根据单日摘要数据渲染并保存HTML报告，返回报告文件路径。
+    当天的摘要、模板、渲染脚本和输出选项都没有变化时跳过渲染（force=True 时总是重新生成）。
+    options 为输出选项（见 report_options），未给出的项使用默认值。
+    """
+    output_file = daily_report_path(summary_data)
+    options = report_options.make_options(options)
+    with timing.stage('检查清单'):
+        manifest = report_manifest.load_manifest()
+        unchanged = not force and summary_data.get("report_date") and report_manifest.stale_reason(manifest, summary_data, output_file, options) is None
+    if unchanged:
+        print(f"报告未变化，跳过: {output_file}")
+        return output_file
+
+    historical_data = prepare_historical_data(history_store.DB_FILE, options['trend_bucket'], options['trend_points'])
+    with timing.stage('共享资源'):
+        history_src = history_source(historical_data, options['data_mode'])
+        echarts = report_assets.echarts_context(options['echarts_mode'])
+    output_file = render_daily_report(summary_data, historical_data, history_src, echarts, options['live_reload'])
+    if summary_data.get("report_date"):
+        with timing.stage('更新清单'):
+            report_manifest.record(manifest, summary_data, output_file, options)
+            report_manifest.save_manifest(manifest)
+    return output_file
+
+def render_daily_report(summary_data, historical_data, history_src=None, echarts=None, live_reload=False):
+    """
+    用已经准备好的历史趋势数据渲染并保存单日报告，返回报告文件路径。
+    给出 history_src 时报告引用该共享数据文件，不再嵌入历史数据；
+    echarts 为 report_assets.echarts_context 的结果，默认从CDN加载；live_reload 时页面会在报告更新后自动刷新。
+    """
+    template_file = templating.REPORT_TEMPLATE
+
     report_date = summary_data.get("report_date")
-    date_str = report_date or datetime.datetime.now().strftime("%Y-%m-%d")
-    output_file = f'reports/report-daily-{date_str}.html'
+    output_file = daily_report_path(summary_data)
 
-    chart_data, pie_data = prepare_data_for_template(summary_data)
-    stacked_bar_data = prepare_stacked_bar_data(summary_data)
-    historical_data = prepare_historical_data('data/historical_data.csv')
+    with timing.stage('整理图表数据'):
+        chart_data, pie_data = prepare_data_for_template(summary_data)
+        stacked_bar_data = prepare_stacked_bar_data(summary_data)
+        timeline_rows = [{"date": report_date, "minutes": summary_data['timeline']}] if summary_data.get('timeline') else []
     generation_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    # 为新图表准备数据
-    # Treemap 数据可以复用旭日图的数据结构
-    treemap_data = chart_data
-    # Streamgraph 和 Small Multiples 可以复用历史数据
-    streamgraph_data = historical_data
-    small_multiples_data = historical_data
-
-    env = Environment(loader=FileSystemLoader('templates'))
-    template = env.get_template(template_file)
+    template = templating.get_report_template(template_file)
     
-    html_content = template.render(
+    templating.render_to_file(
+        template,
+        output_file,
+        **(echarts or report_assets.echarts_context()),
         report_date=report_date,
         data=summary_data,
         chart_data=chart_data,
         pie_data=pie_data,
         stacked_bar_data=stacked_bar_data,
         historical_data=historical_data,
-        generation_time=generation_time,
-        # 新增图表数据
-        treemap_data=treemap_data,
-        streamgraph_data=streamgraph_data,
-        small_multiples_data=small_multiples_data
+        history_src=history_src,
+        timeline_rows=timeline_rows,
+        live_reload=live_reload,
+        generation_time=generation_time
     )
+
+    return output_file
+
+# --- 批量生成 ---
+
+# 批量模式下每个子进程共享的历史趋势数据、共享数据文件地址和 ECharts 加载方式，
+# 由 init_batch_worker 设置，避免随每个任务重复传输
+_batch_historical_data = None
+_batch_history_src = None
+_batch_echarts = None
+
+def init_batch_worker(historical_data, history_src, echarts):
+    """进程池初始化：保存历史趋势数据等所有报告共用的内容。"""
+    global _batch_historical_data, _batch_history_src, _batch_echarts
+    _batch_historical_data = historical_data
+    _batch_history_src = history_src
+    _batch_echarts = echarts
+
+def render_batch_day(summary_data):
+    """进程池任务：渲染一天的报告。"""
+    return render_daily_report(summary_data, _batch_historical_data, _batch_history_src, _batch_echarts)
+
+def parse_date_range(value):
+    """解析 'YYYY-MM-DD..YYYY-MM-DD' 或单个 'YYYY-MM-DD'，返回 (开始日期, 结束日期) 字符串。"""
+    start, _, end = value.partition('..')
+    end = end or start
+    try:
+        start_date = datetime.datetime.strptime(start.strip(), '%Y-%m-%d').date()
+        end_date = datetime.datetime.strptime(end.strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"日期范围格式不正确: '{value}'，应为 YYYY-MM-DD..YYYY-MM-DD。")
+    if start_date > end_date:
+        raise ValueError("开始日期不能晚于结束日期。")
+    return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+
+def load_daily_summaries(start, end, db_file=history_store.DB_FILE):
+    """一次查询读出日期范围内的全部记录和打点时间，逐日重建摘要。返回 [summary_data, ...]（按日期排序）。"""
+    with closing(history_store.connect(db_file)) as conn:
+        records = history_store.fetch_records(conn, start, end)
+        timelines = dict(history_store.fetch_timestamps(conn, start, end))
+    summaries = []
+    for date_str, day_records in itertools.groupby(records, key=lambda record: record[0]):
+        rows = [record[1:] for record in day_records]
+        log_date = datetime.datetime.strptime(date_str, '%Y-%m-%d')
+        summaries.append(process_log.rows_to_summary(rows, log_date, timelines.get(date_str)))
+    return summaries
+
+def build_daily_reports(start, end, jobs=None, force=False, options=None, db_file=history_store.DB_FILE):
+    """
+    批量生成日期范围内每一天的报告：历史数据只读取一次，各天的渲染分发到进程池。
+    jobs 为进程数（默认等于CPU核数），为 1 时在当前进程内依次渲染；未变化的报告会被跳过（force=True 时全部重新生成）。
+    返回报告路径列表（按日期排序，包括被跳过的报告）。
+    """
+    with timing.stage('读取历史记录'):
+        summaries = load_daily_summaries(start, end, db_file)
+    if not summaries:
+        return []
+
+    options = report_options.make_options(options)
+    with timing.stage('检查清单'):
+        manifest = report_manifest.load_manifest()
+        pending = [summary_data for summary_data in summaries
+                   if force or report_manifest.stale_reason(manifest, summary_data, daily_report_path(summary_data), options)]
+    skipped = len(summaries) - len(pending)
+    if skipped:
+        print(f"{skipped} 份报告未变化，已跳过。")
+
+    if pending:
+        historical_data = prepare_historical_data(db_file, options['trend_bucket'], options['trend_points'])
+        # 共享数据文件和 ECharts 副本只在主进程中写一次
+        with timing.stage('共享资源'):
+            history_src = history_source(historical_data, options['data_mode'])
+            echarts = report_assets.echarts_context(options['echarts_mode'])
+        jobs = min(jobs or os.cpu_count() or 1, len(pending))
+        # 在主进程中编译一次模板并写入字节码缓存，子进程直接加载
+        templating.get_report_template()
+        if jobs == 1:
+            output_files = [render_daily_report(summary_data, historical_data, history_src, echarts) for summary_data in pending]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            # 子进程中各阶段的耗时不会传回，这里只记录并行渲染的总耗时
+            with timing.stage('并行渲染'), ProcessPoolExecutor(max_workers=jobs, initializer=init_batch_worker,
+                                                             initargs=(historical_data, history_src, echarts)) as executor:
+                output_files = list(executor.map(render_batch_day, pending))
+        with timing.stage('更新清单'):
+            for summary_data, output_file in zip(pending, output_files):
+                report_manifest.record(manifest, summary_data, output_file, options)
+            report_manifest.save_manifest(manifest)
+
+    return [daily_report_path(summary_data) for summary_data in summaries]
+
+def report_status(db_file=history_store.DB_FILE):
+    """对照历史数据检查每一天的报告，返回需要重新生成的 [(日期, 原因), ...]。"""
+    manifest = report_manifest.load_manifest()
+    with timing.stage('读取历史记录'):
+        summaries = load_daily_summaries(None, None, db_file)
+    stale = []
+    for summary_data in summaries:
+        reason = report_manifest.stale_reason(manifest, summary_data, daily_report_path(summary_data))
+        if reason:
+            stale.append((summary_data['report_date'], reason))
+    return stale
+
+def main():
+    """主函数：读取JSON，渲染并保存HTML报告。"""
+    parser = argparse.ArgumentParser(description="根据每日摘要JSON生成HTML报告。")
+    parser.add_argument('--summary', type=str, default='data/summary.json',
+                        help="每日摘要JSON文件路径（例如 process_log.py --all 生成的 data/summaries/summary-<日期>.json）。")
+    parser.add_argument('--dates', type=str,
+                        help="批量模式：从历史数据为日期范围内的每一天生成报告，格式 YYYY-MM-DD..YYYY-MM-DD。")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="批量模式使用的进程数，默认等于CPU核数。")
+    parser.add_argument('--force', action='store_true',
+                        help="即使数据、模板和脚本都没有变化也重新生成报告。")
+    parser.add_argument('--status', action='store_true',
+                        help="对照历史数据列出需要重新生成的每日报告。")
+    report_options.add_arguments(parser)
+    timing.add_arguments(parser)
+    args = parser.parse_args()
+    with timing.profiling(args):
+        run(parser, args)
+
+def run(parser, args):
+    """按命令行参数生成报告或列出需要重新生成的报告。"""
+    options = report_options.from_args(args)
+
+    if args.status:
+        stale = report_status()
+        for date_str, reason in stale:
+            print(f"{date_str}: {reason}")
+        print(f"共 {len(stale)} 份报告需要重新生成。" if stale else "所有每日报告都是最新的。")
+        return
+
+    if args.dates:
+        try:
+            start, end = parse_date_range(args.dates)
+        except ValueError as e:
+            parser.error(str(e))
+        try:
+            report_files = build_daily_reports(start, end, args.jobs, args.force, options)
+        except RuntimeError as e:
+            print(f"错误: {e}")
+            return
+        if not report_files:
+            print(f"历史数据中没有 {start} 至 {end} 的记录。")
+        for report_file in report_files:
+            print(f"--> {report_file}")
+        return
+
+    json_file = args.summary
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    try:
+        with timing.stage('读取摘要'), open(json_file, 'r', encoding='utf-8') as f:
+            summary_data = json.load(f)
+    except FileNotFoundError:
+        print(f"错误: 未找到 '{json_file}'。请先运行 'process_log.py'。")
+        return
+    except json.JSONDecodeError:
+        print(f"错误: '{json_file}' 文件格式不正确。")
+        return
+
+    try:
+        output_file = build_daily_report(summary_data, args.force, options)
+    except RuntimeError as e:
+        print(f"错误: {e}")
+        return
         
     # Standardize the output for easy parsing by the GUI
     print(f"--> {output_file}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
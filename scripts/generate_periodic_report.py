@@ -1,112 +1,43 @@
-import pandas as pd
-from jinja2 import Environment, FileSystemLoader
 import datetime
 import argparse
 import os
 
-# --- Predefined color list for categories ---
-CATEGORY_COLORS = {
-    '第一类': '#3498db',
-    '第二类': '#2ecc71',
-    '根源': '#9b59b6',
-    '娱乐': '#f1c40f',
-    '杂项': '#e74c3c',
-    'default': '#7f8c8d'
-}
-COLOR_LIST = ['#5470C6', '#91CC75', '#FAC858', '#EE6666', '#73C0DE', '#3BA272', '#FC8452', '#9A60B4', '#EA7CCC']
+import history_store
+import report_assets
+import report_options
+import templating
+import timing
+from report_data import build_hierarchy, calendar_data, downsample_columns, history_columns, hour_heatmap, minutes_to_time_str
 
-
-def minutes_to_time_str(minutes):
-    """将分钟数转换为'Xh Ym'格式的字符串。"""
-    if minutes is None or minutes < 0:
-        return "0m"
-    if minutes == 0:
-        return "0m"
-    hours = minutes // 60
-    mins = minutes % 60
-    result = ''
-    if hours > 0:
-        result += f"{hours}h"
-    if mins > 0:
-        result += ('' if result == '' else ' ') + f"{mins}m"
-    return result
+# 周期报告的时间线最多显示的天数（周期内的最后若干天）
+TIMELINE_MAX_DAYS = 31
 
 def prepare_chart_and_pie_data(df):
     """从周期性DataFrame准备旭日图/卡片和饼图的数据。"""
-    
-    tasks_grouped = df.groupby(['Category', 'Item', 'Task'])['Task Duration (minutes)'].sum().reset_index()
-
-    nested_data = {}
-    for _, row in tasks_grouped.iterrows():
-        cat, item, task, duration = row['Category'], row['Item'], row['Task'], row['Task Duration (minutes)']
-        if cat not in nested_data:
-            nested_data[cat] = {}
-        if item not in nested_data[cat]:
-            nested_data[cat][item] = {}
-        nested_data[cat][item][task] = duration
-    
-    chart_data = []
-    pie_data = []
-    color_index = 0
-    sorted_categories = sorted(nested_data.keys())
-
-    for category in sorted_categories:
-        items = nested_data[category]
-        category_total_minutes = sum(sum(tasks.values()) for tasks in items.values())
-        color = CATEGORY_COLORS.get(category, COLOR_LIST[color_index % len(COLOR_LIST)])
-        color_index += 1
-
-        children = []
-        for item, tasks in items.items():
-            item_minutes = sum(tasks.values())
-            tasks_children = []
-            for task, duration in tasks.items():
-                tasks_children.append({
-                    "name": task,
-                    "value": duration,
-                    "time_str": minutes_to_time_str(duration)
-                })
-            children.append({
-                "name": item,
-                "value": item_minutes,
-                "value_str": minutes_to_time_str(item_minutes),
-                "children": sorted(tasks_children, key=lambda x: x['value'], reverse=True)
-            })
-        
-        chart_data.append({
-            "name": category,
-            "value": category_total_minutes,
-            "value_str": minutes_to_time_str(category_total_minutes),
-            "itemStyle": {"color": color},
-            "children": sorted(children, key=lambda x: x['value'], reverse=True)
-        })
-        
-        pie_data.append({
-            "name": category,
-            "value": category_total_minutes,
-            "itemStyle": {"color": color}
-        })
-        
-    return chart_data, pie_data
+    # 类别按名称排序，子项和任务按时长从大到小排序
+    return build_hierarchy(df, sort_keys=True, sort_children_by_value=True, use_color_list=True)
 
 def prepare_stacked_bar_data(df):
     """为堆叠柱状图准备数据。"""
     y_axis_data = sorted(df['Category'].unique().tolist())
     legend_data = sorted(df['Item'].unique().tolist())
+
+    # 一次分组聚合得到 子项 × 类别 的时长矩阵，缺失的组合补0
+    matrix = (
+        df.groupby(['Item', 'Category'], observed=True)['Task Duration (minutes)'].sum()
+        .unstack(fill_value=0)
+        .reindex(index=legend_data, columns=y_axis_data, fill_value=0)
+    )
     
     series_data = []
-    for subcategory in legend_data:
-        series_item = {
+    for subcategory, row in zip(legend_data, matrix.to_numpy().tolist()):
+        series_data.append({
             "name": subcategory,
             "type": 'bar',
             "stack": 'total',
             "emphasis": {"focus": "series"},
-            "data": []
-        }
-        for category in y_axis_data:
-            total_duration = df[(df['Category'] == category) & (df['Item'] == subcategory)]['Task Duration (minutes)'].sum()
-            series_item['data'].append(int(total_duration))
-        series_data.append(series_item)
+            "data": [int(value) for value in row]
+        })
         
     return {
         "yAxis": y_axis_data,
@@ -114,96 +45,100 @@ def prepare_stacked_bar_data(df):
         "series": series_data
     }
 
-def prepare_historical_data_from_df(df):
-    """从DataFrame准备历史折线图数据。"""
+def prepare_historical_data_from_df(df, bucket='day', points=None):
+    """从DataFrame准备历史折线图数据；bucket 为数据的时间粒度，points 为 LTTB 降采样的目标点数。"""
+    import pandas as pd
+
     try:
-        df['Date'] = pd.to_datetime(df['Date'])
-        df = df.sort_values('Date')
+        if not pd.api.types.is_datetime64_any_dtype(df['Date']):
+            df['Date'] = pd.to_datetime(df['Date'])
+            df = df.sort_values('Date')
 
-        pivot_df = df.pivot_table(index='Date', columns='Category', values='Task Duration (minutes)', aggfunc='sum').fillna(0)
-        
-        dates = pivot_df.index.strftime('%Y-%m-%d').tolist()
-        categories = pivot_df.columns.tolist()
-        
-        series = []
-        for category in categories:
-            series.append({
-                "name": category,
-                "type": 'line',
-                "data": pivot_df[category].tolist()
-            })
-            
-        return {"dates": dates, "categories": categories, "series": series}
+        return downsample_columns(history_columns(df, bucket), points)
     except Exception as e:
         print(f"从DataFrame准备历史数据时出错: {e}")
         return None
 
-def main():
-    """主函数：解析参数，处理数据，生成周期性报告。"""
-    parser = argparse.ArgumentParser(description="生成周期性时间使用报告。")
-    parser.add_argument('--period', type=str, choices=['week', 'month', 'last7days'],
-                        help="预设的报告周期: 'week' (本周), 'month' (本月), 'last7days' (最近7天)。")
-    parser.add_argument('--start', type=str, help="报告周期的开始日期 (YYYY-MM-DD)。")
-    parser.add_argument('--end', type=str, help="报告周期的结束日期 (YYYY-MM-DD)。")
-    parser.add_argument('--output', type=str, help="（可选）指定输出的HTML文件名。")
-    args = parser.parse_args()
-
-    today = datetime.date.today()
+def resolve_period(period=None, start=None, end=None, today=None):
+    """
+    根据预设周期或自定义起止日期 ('YYYY-MM-DD' 字符串或日期对象) 计算报告周期，
+    返回 (start_date, end_date)；无法确定时返回 (None, None)。日期格式错误时抛出 ValueError。
+    """
+    today = today or datetime.date.today()
     start_date, end_date = None, None
 
-    if args.start and args.end:
-        try:
-            start_date = datetime.datetime.strptime(args.start, '%Y-%m-%d').date()
-            end_date = datetime.datetime.strptime(args.end, '%Y-%m-%d').date()
-        except ValueError:
-            print("错误: --start 和 --end 日期格式必须为 YYYY-MM-DD。")
-            return
-    elif args.period:
-        if args.period == 'last7days':
+    if start and end:
+        start_date = start if isinstance(start, datetime.date) else datetime.datetime.strptime(start, '%Y-%m-%d').date()
+        end_date = end if isinstance(end, datetime.date) else datetime.datetime.strptime(end, '%Y-%m-%d').date()
+    elif period:
+        if period == 'last7days':
             start_date = today - datetime.timedelta(days=6)
             end_date = today
-        elif args.period == 'week':
+        elif period == 'week':
             start_date = today - datetime.timedelta(days=today.weekday())
             end_date = today
-        elif args.period == 'month':
+        elif period == 'month':
             start_date = today.replace(day=1)
             end_date = today
-    
-    if not start_date or not end_date:
-        print("错误: 请提供一个有效的报告周期。")
-        return
-        
-    csv_file = 'data/historical_data.csv'
-    if not os.path.exists(csv_file):
-        print(f"错误: 未找到历史数据文件 '{csv_file}'。")
-        return
+    return start_date, end_date
+
+def build_periodic_report(start_date, end_date, period_str='custom', output=None, options=None):
+    """
+    生成指定周期的报告，返回报告文件路径；没有数据或出错时打印原因并返回 None。
+    options 为输出选项（见 report_options），未给出的项使用默认值。
+    """
+    options = report_options.make_options(options)
+    # pandas 在确定要生成报告后才导入，解析参数、计算周期等路径保持轻量
+    with timing.stage('导入 pandas'):
+        import history_cache
+
+    db_file = history_store.DB_FILE
+    if not os.path.exists(db_file) and not os.path.exists(history_store.CSV_FILE):
+        print(f"错误: 未找到历史数据 '{db_file}'。")
+        return None
     
     try:
-        df = pd.read_csv(csv_file)
-        # 显式指定日期格式，以确保解析正确
-        df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d', errors='coerce').dt.date
+        with timing.stage('读取历史'):
+            # 列式缓存中的日期已经是datetime类型，无需重新解析文本；只读取周期内的原始记录
+            period_df = history_cache.load_history(start=start_date, end=end_date, db_file=db_file)
+            # 子项汇总和趋势图直接读取预聚合表
+            item_totals_df = history_cache.load_item_totals(start_date, end_date, db_file=db_file)
+            historical_df, trend_bucket = history_cache.load_trend_rollup(options['trend_bucket'], db_file=db_file)
+            timelines = history_cache.load_timelines(db_file=db_file)
+            daily_category_totals = history_cache.load_daily_category_totals(db_file=db_file)
     except Exception as e:
-        print(f"读取或解析 '{csv_file}' 时出错: {e}")
-        return
-
-    mask = (df['Date'] >= start_date) & (df['Date'] <= end_date)
-    period_df = df.loc[mask]
+        print(f"读取或解析 '{db_file}' 时出错: {e}")
+        return None
 
     if period_df.empty:
         print("指定周期内没有找到任何数据。")
-        return
+        return None
 
     # --- 3. 准备所有图表和模板所需的数据 ---
-    chart_data, pie_data = prepare_chart_and_pie_data(period_df)
-    stacked_bar_data = prepare_stacked_bar_data(period_df)
-    grand_total_minutes = period_df['Task Duration (minutes)'].sum()
+    with timing.stage('汇总图表数据'):
+        chart_data, pie_data = prepare_chart_and_pie_data(period_df)
+        stacked_bar_data = prepare_stacked_bar_data(item_totals_df)
+        grand_total_minutes = period_df['Task Duration (minutes)'].sum()
+        # 时间线只显示周期内最后 TIMELINE_MAX_DAYS 天，避免长周期的图表过高
+        period_range = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        timeline_rows = [{"date": date_str, "minutes": minutes} for date_str, minutes in timelines
+                         if period_range[0] <= date_str <= period_range[1]][-TIMELINE_MAX_DAYS:]
     generation_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     # 为周期报告准备与每日报告一致的历史数据和日历数据
     # 注意：这里的historical_data是为了让模板的折线图部分能复用
-    historical_df = pd.read_csv(csv_file)
-    historical_df['Date'] = pd.to_datetime(historical_df['Date'], format='%Y-%m-%d', errors='coerce')
-    historical_data_for_template = prepare_historical_data_from_df(historical_df)
+    with timing.stage('趋势数据'):
+        historical_data_for_template = prepare_historical_data_from_df(historical_df, trend_bucket, options['trend_points'])
+        heatmap = hour_heatmap(timelines)
+        if historical_data_for_template and heatmap:
+            historical_data_for_template['hour_heatmap'] = heatmap
+        calendar = calendar_data(daily_category_totals)
+        if historical_data_for_template and calendar:
+            historical_data_for_template['calendar'] = calendar
+    history_src = None
+    if options['data_mode'] == 'shared' and historical_data_for_template:
+        with timing.stage('共享资源'):
+            history_src = report_assets.write_history_data(historical_data_for_template)
 
     daily_summary_like = {}
     for cat_data in chart_data:
@@ -213,52 +148,83 @@ def main():
     daily_summary_like["总计"] = minutes_to_time_str(grand_total_minutes)
     template_data_for_card = {"daily_summary": daily_summary_like}
 
-    # 为新图表准备数据
-    treemap_data = chart_data
-    streamgraph_data = historical_data_for_template
-    small_multiples_data = historical_data_for_template
-
     # --- 4. 渲染HTML模板 ---
-    template_file = 'new_report_template.html'
+    template_file = templating.REPORT_TEMPLATE
     try:
-        env = Environment(loader=FileSystemLoader('templates'))
-        template = env.get_template(template_file)
+        template = templating.get_report_template(template_file)
     except Exception as e:
         print(f"错误: 找不到或无法加载模板文件 '{template_file}'。 {e}")
-        return
+        return None
 
-    html_content = template.render(
-        chart_data=chart_data,
-        pie_data=pie_data,
-        stacked_bar_data=stacked_bar_data,
-        data=template_data_for_card,
-        report_period=f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
-        historical_data=historical_data_for_template,
-        generation_time=generation_time,
-        # 新增图表数据
-        treemap_data=treemap_data,
-        streamgraph_data=streamgraph_data,
-        small_multiples_data=small_multiples_data
-    )
-    
-    if args.output:
+    try:
+        with timing.stage('共享资源'):
+            echarts = report_assets.echarts_context(options['echarts_mode'])
+    except RuntimeError as e:
+        print(f"错误: {e}")
+        return None
+
+    if output:
         # If an output path is specified, ensure it's in the reports directory
-        if not args.output.startswith('reports/'):
-             output_file = os.path.join('reports', os.path.basename(args.output))
+        if not output.startswith('reports/'):
+             output_file = os.path.join('reports', os.path.basename(output))
         else:
-            output_file = args.output
+            output_file = output
     else:
-        period_str = args.period or 'custom'
         date_str = start_date.strftime("%Y%m%d")
         output_file = f"reports/report-periodic-{period_str}-{date_str}.html"
 
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        # Standardize the output for easy parsing by the GUI
-        print(f"--> {output_file}")
+        templating.render_to_file(
+            template,
+            output_file,
+            **echarts,
+            chart_data=chart_data,
+            pie_data=pie_data,
+            stacked_bar_data=stacked_bar_data,
+            data=template_data_for_card,
+            report_period=f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
+            historical_data=historical_data_for_template,
+            history_src=history_src,
+            timeline_rows=timeline_rows,
+            generation_time=generation_time
+        )
     except Exception as e:
         print(f"错误: 无法写入报告文件 '{output_file}'。 {e}")
+        return None
+
+    return output_file
+
+def main():
+    """主函数：解析参数，处理数据，生成周期性报告。"""
+    parser = argparse.ArgumentParser(description="生成周期性时间使用报告。")
+    parser.add_argument('--period', type=str, choices=['week', 'month', 'last7days'],
+                        help="预设的报告周期: 'week' (本周), 'month' (本月), 'last7days' (最近7天)。")
+    parser.add_argument('--start', type=str, help="报告周期的开始日期 (YYYY-MM-DD)。")
+    parser.add_argument('--end', type=str, help="报告周期的结束日期 (YYYY-MM-DD)。")
+    parser.add_argument('--output', type=str, help="（可选）指定输出的HTML文件名。")
+    report_options.add_arguments(parser)
+    timing.add_arguments(parser)
+    args = parser.parse_args()
+    with timing.profiling(args):
+        run(args)
+
+def run(args):
+    """按命令行参数计算报告周期并生成报告。"""
+    try:
+        start_date, end_date = resolve_period(args.period, args.start, args.end)
+    except ValueError:
+        print("错误: --start 和 --end 日期格式必须为 YYYY-MM-DD。")
+        return
+    
+    if not start_date or not end_date:
+        print("错误: 请提供一个有效的报告周期。")
+        return
+
+    output_file = build_periodic_report(start_date, end_date, args.period or 'custom', args.output, report_options.from_args(args))
+    if output_file:
+        # Standardize the output for easy parsing by the GUI
+        print(f"--> {output_file}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
+ 
\ No newline at end of file
@@ -0,0 +1,158 @@
+import json
+import os
+from contextlib import closing
+
+import pandas as pd
+
+import history_store
+
+CACHE_BASE = 'data/history.cache'
+# 趋势图自动选择粒度的阈值（历史跨度的天数）：超过约一年按周、超过约三年按月
+AUTO_WEEK_DAYS = 366
+AUTO_MONTH_DAYS = 3 * 366
+CATEGORICAL_COLUMNS = ['Category', 'Item', 'Task']
+DURATION_COLUMN = 'Task Duration (minutes)'
+
+# 进程内的缓存：{ (db_file, mtime_ns, size): DataFrame }，供常驻进程重复使用
+_memory_cache = {}
+
+def parquet_available():
+    """是否可以使用 Parquet 格式（需要 pyarrow）。"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def source_signature(db_file):
+    """返回数据源文件的 (mtime_ns, size)，用于判断缓存是否过期。"""
+    if not os.path.exists(db_file):
+        # 让历史库完成建表以及从CSV的首次迁移
+        with closing(history_store.connect(db_file)):
+            pass
+    stat = os.stat(db_file)
+    return stat.st_mtime_ns, stat.st_size
+
+def build_frame(db_file):
+    """从历史库读取全部记录，转换为紧凑的列式类型。"""
+    df = history_store.load_dataframe(db_file=db_file)
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d', errors='coerce')
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = df[column].astype('category')
+    df[DURATION_COLUMN] = df[DURATION_COLUMN].astype('int32')
+    return df.sort_values('Date', kind='stable').reset_index(drop=True)
+
+def write_cache(df, signature, cache_base):
+    """写入列式缓存及其元数据（均先写临时文件再重命名）。"""
+    if parquet_available():
+        cache_format, cache_file = 'parquet', cache_base + '.parquet'
+        df.to_parquet(cache_file + '.tmp', index=False)
+    else:
+        cache_format, cache_file = 'pickle', cache_base + '.pkl'
+        df.to_pickle(cache_file + '.tmp')
+    os.replace(cache_file + '.tmp', cache_file)
+
+    meta = {"format": cache_format, "file": cache_file, "mtime_ns": signature[0], "size": signature[1]}
+    with open(cache_base + '.json.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(cache_base + '.json.tmp', cache_base + '.json')
+
+def read_cache(signature, cache_base, columns=None):
+    """如果缓存与数据源一致则读取缓存，否则返回 None。"""
+    try:
+        with open(cache_base + '.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if (meta.get("mtime_ns"), meta.get("size")) != tuple(signature) or not os.path.exists(meta.get("file", "")):
+        return None
+    try:
+        if meta["format"] == 'parquet':
+            if not parquet_available():
+                return None
+            if columns and 'Date' not in columns:
+                columns = ['Date'] + list(columns)
+            return pd.read_parquet(meta["file"], columns=columns)
+        return pd.read_pickle(meta["file"])
+    except Exception as e:
+        print(f"读取历史缓存失败，将重新生成: {e}")
+        return None
+
+def load_history(columns=None, start=None, end=None, db_file=history_store.DB_FILE, cache_base=CACHE_BASE):
+    """
+    读取历史记录。Date 为 datetime64，Category/Item/Task 为 category 类型。
+    只有当历史库文件的 mtime 或大小变化时才会重建缓存；
+    columns 限定需要的列，start/end（含两端，'YYYY-MM-DD' 或日期对象）限定日期范围。
+    """
+    signature = source_signature(db_file)
+    key = (os.path.abspath(db_file), *signature)
+    df = _memory_cache.get(key)
+    if df is None:
+        df = read_cache(signature, cache_base, columns)
+        if df is None:
+            df = build_frame(db_file)
+            write_cache(df, signature, cache_base)
+        if len(df.columns) == len(history_store.HEADER):
+            _memory_cache.clear()
+            _memory_cache[key] = df
+
+    if start is not None or end is not None:
+        # 数据按日期排序，直接二分定位日期范围
+        dates = df['Date'].values
+        lo = dates.searchsorted(pd.Timestamp(start).to_datetime64(), 'left') if start is not None else 0
+        hi = dates.searchsorted(pd.Timestamp(end).to_datetime64(), 'right') if end is not None else len(df)
+        df = df.iloc[lo:hi]
+    if columns is not None:
+        df = df[list(columns)]
+    return df.copy()
+
+def date_param(value):
+    """把日期参数统一为 'YYYY-MM-DD' 字符串。"""
+    if value is None:
+        return None
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+def load_category_rollup(granularity='day', start=None, end=None, db_file=history_store.DB_FILE):
+    """
+    读取预聚合的 日/周/月 × 类别 汇总，只有几百行，无需扫描原始记录。
+    列名与历史记录保持一致：Date（周期第一天）、Category、Task Duration (minutes)。
+    """
+    with closing(history_store.connect(db_file)) as conn:
+        rows = history_store.fetch_category_rollup(conn, granularity, date_param(start), date_param(end))
+    df = pd.DataFrame(rows, columns=['Date', 'Category', DURATION_COLUMN])
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+    return df
+
+def load_trend_rollup(bucket='auto', db_file=history_store.DB_FILE):
+    """
+    读取趋势图所需的 类别 汇总。bucket 为 'day'/'week'/'month'，或 'auto'：按历史跨度自动选择。
+    返回 (DataFrame, 实际使用的粒度)。
+    """
+    if bucket == 'auto':
+        df = load_category_rollup('day', db_file=db_file)
+        bucket = 'day'
+        if not df.empty:
+            span_days = (df['Date'].iloc[-1] - df['Date'].iloc[0]).days
+            if span_days > AUTO_MONTH_DAYS:
+                bucket = 'month'
+            elif span_days > AUTO_WEEK_DAYS:
+                bucket = 'week'
+        if bucket == 'day':
+            return df, bucket
+    return load_category_rollup(bucket, db_file=db_file), bucket
+
+def load_timelines(start=None, end=None, db_file=history_store.DB_FILE):
+    """读取一个日期范围内每天的打点时间：[(date, [分钟偏移, ...]), ...]，供时间线和作息热力图使用。"""
+    with closing(history_store.connect(db_file)) as conn:
+        return history_store.fetch_timestamps(conn, date_param(start), date_param(end))
+
+def load_daily_category_totals(db_file=history_store.DB_FILE):
+    """读取全部历史的 日×类别 汇总行 (date, category, minutes)，供年度日历热力图使用。"""
+    with closing(history_store.connect(db_file)) as conn:
+        return history_store.fetch_category_rollup(conn, 'day')
+
+def load_item_totals(start=None, end=None, db_file=history_store.DB_FILE):
+    """读取一个日期范围内每个 (Category, Item) 的总时长（来自 日×子项 预聚合表）。"""
+    with closing(history_store.connect(db_file)) as conn:
+        rows = history_store.fetch_item_totals(conn, date_param(start), date_param(end))
+    return pd.DataFrame(rows, columns=['Category', 'Item', DURATION_COLUMN])
@@ -0,0 +1,143 @@
+import argparse
+import time
+from contextlib import closing
+
+import history_store
+from report_data import minutes_to_time_str
+
+# trigram 全文索引只能匹配至少3个字符的词，更短的词用 LIKE 在索引筛出的结果（或全部记录）中过滤
+MIN_INDEXED_LENGTH = 3
+PERIODS = ('day', 'week', 'month', 'year')
+PERIOD_NAMES = {'day': '日', 'week': '周', 'month': '月', 'year': '年'}
+
+
+def fts_phrase(term):
+    """把搜索词转为 FTS5 的短语（双引号内的双引号需要写两次），按子串匹配子项或任务。"""
+    return '"' + term.replace('"', '""') + '"'
+
+def like_pattern(term):
+    """把搜索词转为 LIKE 的子串模式，转义其中的通配符。"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+def build_query(terms, category=None, item=None, start=None, end=None, use_index=True):
+    """
+    生成读取匹配记录 (date, category, item, task, minutes) 的SQL和参数。
+    每个词都要在子项或任务中出现（不区分大小写）；足够长的词交给全文索引，其余的用 LIKE 过滤。
+    """
+    conditions = []
+    params = []
+    indexed = [term for term in terms if use_index and len(term) >= MIN_INDEXED_LENGTH]
+    if indexed:
+        conditions.append("id IN (SELECT rowid FROM records_fts WHERE records_fts MATCH ?)")
+        params.append(" AND ".join(fts_phrase(term) for term in indexed))
+    for term in terms:
+        if term not in indexed:
+            conditions.append("(item LIKE ? ESCAPE '\\' OR task LIKE ? ESCAPE '\\')")
+            params.extend([like_pattern(term)] * 2)
+    if category:
+        conditions.append("category = ?")
+        params.append(category)
+    if item:
+        conditions.append("item = ?")
+        params.append(item)
+    if start:
+        conditions.append("date >= ?")
+        params.append(start)
+    if end:
+        conditions.append("date <= ?")
+        params.append(end)
+    # 不在SQL中 GROUP BY：按多个文本列排序分组比在Python中用字典累加慢得多
+    query = "SELECT date, category, item, task, minutes FROM records"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query, params
+
+def period_start(date_str, period):
+    """某一天所在周期的第一天。"""
+    if period == 'year':
+        return date_str[:4] + '-01-01'
+    return history_store.period_bounds(date_str, period)[0]
+
+def search(query, category=None, item=None, start=None, end=None, period='month', db_file=history_store.DB_FILE):
+    """
+    在全部历史的子项和任务名中搜索 query（空格分隔的多个词需同时匹配），可限定类别、子项和日期范围（含两端）。
+    返回:
+    {
+        "query": 搜索词, "total_minutes": 总分钟数, "records": 匹配的记录数, "indexed": 是否使用了全文索引,
+        "days": [(日期, 分钟数), ...], "periods": [(周期第一天, 分钟数), ...] (按 period 汇总),
+        "tasks": [(类别, 子项, 任务, 分钟数), ...] (按总时长从大到小)
+    }
+    """
+    terms = query.split()
+    with closing(history_store.connect(db_file)) as conn:
+        indexed = history_store.search_index_available(conn)
+        sql, params = build_query(terms, category, item, start, end, use_index=indexed)
+        rows = conn.execute(sql, params).fetchall()
+
+    days, tasks = {}, {}
+    for date_str, row_category, row_item, task, minutes in rows:
+        days[date_str] = days.get(date_str, 0) + minutes
+        task_key = (row_category, row_item, task)
+        tasks[task_key] = tasks.get(task_key, 0) + minutes
+    days = dict(sorted(days.items()))
+    # 周期由每天的汇总再相加，每个日期只计算一次所在的周期
+    periods = {}
+    for date_str, minutes in days.items():
+        key = period_start(date_str, period)
+        periods[key] = periods.get(key, 0) + minutes
+    return {
+        "query": query,
+        "total_minutes": sum(days.values()),
+        "records": len(rows),
+        "indexed": indexed and any(len(term) >= MIN_INDEXED_LENGTH for term in terms),
+        "days": list(days.items()),
+        "periods": list(periods.items()),
+        "tasks": sorted(((*key, minutes) for key, minutes in tasks.items()), key=lambda row: -row[3]),
+    }
+
+def print_results(results, period, show_days=False, limit=20):
+    """打印搜索结果：总计、按周期的汇总、耗时最多的任务，以及（可选的）每天的汇总。"""
+    if not results['records']:
+        print(f"没有找到与 '{results['query']}' 匹配的记录。")
+        return
+    days = results['days']
+    print(f"'{results['query']}': 共 {minutes_to_time_str(results['total_minutes'])}，"
+          f"{len(days)} 天（{days[0][0]} ~ {days[-1][0]}）")
+
+    print(f"\n按{PERIOD_NAMES[period]}汇总:")
+    for start, minutes in results['periods']:
+        print(f"  {start}  {minutes_to_time_str(minutes)}")
+
+    print("\n任务:")
+    for category, item, task, minutes in results['tasks'][:limit]:
+        print(f"  {category}/{item}/{task}  {minutes_to_time_str(minutes)}")
+    if len(results['tasks']) > limit:
+        print(f"  ... 另有 {len(results['tasks']) - limit} 项")
+
+    if show_days:
+        print("\n每日:")
+        for date_str, minutes in days:
+            print(f"  {date_str}  {minutes_to_time_str(minutes)}")
+
+def main():
+    """命令行入口：在历史记录的子项和任务名中搜索，并按天和周期汇总耗时。"""
+    parser = argparse.ArgumentParser(description="在全部历史的子项和任务名中搜索，统计匹配记录的耗时。")
+    parser.add_argument('query', help="搜索词（按子串匹配，不区分大小写）；多个词用空格分隔时需同时匹配。")
+    parser.add_argument('--category', type=str, help="只搜索该类别，例如 第一类、杂项。")
+    parser.add_argument('--item', type=str, help="只搜索该子项，例如 工程。")
+    parser.add_argument('--start', type=str, help="开始日期 (YYYY-MM-DD)。")
+    parser.add_argument('--end', type=str, help="结束日期 (YYYY-MM-DD)。")
+    parser.add_argument('--period', choices=PERIODS, default='month', help="汇总的周期，默认按月。")
+    parser.add_argument('--days', action='store_true', help="同时列出每天的耗时。")
+    parser.add_argument('--limit', type=int, default=20, help="最多列出的任务数。")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = search(args.query, args.category, args.item, args.start, args.end, args.period)
+    elapsed = (time.perf_counter() - start) * 1000
+    print_results(results, args.period, args.days, args.limit)
+    print(f"\n查询用时 {elapsed:.1f} ms（{'全文索引' if results['indexed'] else '逐条扫描'}）。")
+
+if __name__ == "__main__":
+    main()
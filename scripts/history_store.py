@@ -0,0 +1,372 @@
+import sqlite3
+import csv
+import os
+import sys
+import argparse
+import datetime
+from array import array
+from contextlib import closing
+
+DB_FILE = 'data/history.db'
+CSV_FILE = 'data/historical_data.csv'
+HEADER = ['Date', 'Category', 'Item', 'Task', 'Task Duration (minutes)']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    category TEXT NOT NULL,
+    item TEXT NOT NULL,
+    task TEXT NOT NULL,
+    minutes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_records_date ON records(date);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS rollup_day_category (
+    period_start TEXT NOT NULL,
+    category TEXT NOT NULL,
+    minutes INTEGER NOT NULL,
+    PRIMARY KEY (period_start, category)
+);
+CREATE TABLE IF NOT EXISTS rollup_day_item (
+    period_start TEXT NOT NULL,
+    category TEXT NOT NULL,
+    item TEXT NOT NULL,
+    minutes INTEGER NOT NULL,
+    PRIMARY KEY (period_start, category, item)
+);
+CREATE TABLE IF NOT EXISTS rollup_week_category (
+    period_start TEXT NOT NULL,
+    category TEXT NOT NULL,
+    minutes INTEGER NOT NULL,
+    PRIMARY KEY (period_start, category)
+);
+CREATE TABLE IF NOT EXISTS rollup_month_category (
+    period_start TEXT NOT NULL,
+    category TEXT NOT NULL,
+    minutes INTEGER NOT NULL,
+    PRIMARY KEY (period_start, category)
+);
+CREATE TABLE IF NOT EXISTS day_timestamps (
+    date TEXT PRIMARY KEY,
+    minutes BLOB NOT NULL
+);
+"""
+
+# 子项和任务名的全文索引：以 records 为外部内容的 FTS5 表（trigram 分词，支持任意子串和中文），
+# 由触发器随 records 的每次写入和删除同步更新，写入一天只涉及当天的几条记录
+SEARCH_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+        item, task, content='records', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS records_fts_insert AFTER INSERT ON records BEGIN
+        INSERT INTO records_fts (rowid, item, task) VALUES (new.id, new.item, new.task);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS records_fts_delete AFTER DELETE ON records BEGIN
+        INSERT INTO records_fts (records_fts, rowid, item, task) VALUES ('delete', old.id, old.item, old.task);
+    END""",
+]
+SEARCH_INDEX_VERSION = '1'
+# day_timestamps 以 uint16 保存分钟偏移，能表示的最大值
+MAX_TIMESTAMP_MINUTES = 0xFFFF
+
+# 预聚合表：period_start 为该周期第一天的日期（周以ISO周的周一开始，月以1号开始）
+ROLLUP_TABLES = {
+    'day': 'rollup_day_category',
+    'week': 'rollup_week_category',
+    'month': 'rollup_month_category',
+}
+ROLLUPS_VERSION = '1'
+
+def connect(db_file=DB_FILE, csv_file=CSV_FILE):
+    """打开历史数据库并确保表结构存在；首次使用时自动从旧的CSV迁移数据。"""
+    directory = os.path.dirname(db_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_file)
+    conn.executescript(SCHEMA)
+    ensure_search_index(conn)
+    if get_meta(conn, 'migrated_from_csv') is None:
+        if csv_file and os.path.isfile(csv_file):
+            migrate_from_csv(conn, csv_file)
+        else:
+            # 没有旧数据可迁移，记录下来以免之后出现的CSV覆盖已有记录
+            with conn:
+                set_meta(conn, 'migrated_from_csv', '')
+    if get_meta(conn, 'rollups_version') != ROLLUPS_VERSION:
+        rebuild_rollups(conn)
+    return conn
+
+def ensure_search_index(conn):
+    """
+    确保全文索引和同步触发器存在，第一次建立时为已有的全部记录建索引。
+    当前的 SQLite 不支持 FTS5 或 trigram 分词时返回 False，搜索会退回到 LIKE 扫描。
+    """
+    if get_meta(conn, 'search_index_version') == SEARCH_INDEX_VERSION:
+        return True
+    try:
+        with conn:
+            for statement in SEARCH_SCHEMA:
+                conn.execute(statement)
+            conn.execute("INSERT INTO records_fts (records_fts) VALUES ('rebuild')")
+            set_meta(conn, 'search_index_version', SEARCH_INDEX_VERSION)
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+def search_index_available(conn):
+    """全文索引是否可用。"""
+    return get_meta(conn, 'search_index_version') == SEARCH_INDEX_VERSION
+
+def get_meta(conn, key):
+    """读取 meta 表中的值，不存在时返回 None。"""
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def set_meta(conn, key, value):
+    """写入 meta 表（调用方负责事务）。"""
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+def read_csv_rows(csv_file):
+    """读取旧格式的 historical_data.csv，返回 (date, category, item, task, minutes) 列表。"""
+    rows = []
+    with open(csv_file, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # 跳过表头
+        for row in reader:
+            if len(row) < 5 or not row[0]:
+                continue
+            try:
+                minutes = int(float(row[4]))
+            except ValueError:
+                continue
+            rows.append((row[0], row[1], row[2], row[3], minutes))
+    return rows
+
+def migrate_from_csv(conn, csv_file=CSV_FILE):
+    """
+    一次性把CSV中的历史数据导入数据库。
+    导入和迁移标记在同一个事务中提交，中途崩溃不会留下一半的数据，下次启动会重新迁移。
+    """
+    rows = read_csv_rows(csv_file)
+    with conn:
+        conn.execute("DELETE FROM records")
+        conn.executemany(
+            "INSERT INTO records (date, category, item, task, minutes) VALUES (?, ?, ?, ?, ?)", rows
+        )
+        set_meta(conn, 'migrated_from_csv', os.path.abspath(csv_file))
+    rebuild_rollups(conn)
+    print(f"已从 '{csv_file}' 迁移 {len(rows)} 条历史记录到数据库。")
+    return len(rows)
+
+def period_bounds(date_str, granularity):
+    """返回某一天所在周期的 (第一天, 最后一天)，均为 'YYYY-MM-DD'。"""
+    day = datetime.date.fromisoformat(date_str)
+    if granularity == 'week':
+        start = day - datetime.timedelta(days=day.weekday())
+        end = start + datetime.timedelta(days=6)
+    elif granularity == 'month':
+        start = day.replace(day=1)
+        end = (start + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+    else:
+        start = end = day
+    return start.isoformat(), end.isoformat()
+
+def refresh_day_rollups(conn, date_str):
+    """
+    重新计算某一天相关的预聚合数据（调用方负责事务）：
+    当天的 类别/子项 汇总，以及当天所在的周和月的类别汇总。
+    """
+    conn.execute("DELETE FROM rollup_day_category WHERE period_start = ?", (date_str,))
+    conn.execute(
+        "INSERT INTO rollup_day_category (period_start, category, minutes) "
+        "SELECT date, category, SUM(minutes) FROM records WHERE date = ? GROUP BY date, category",
+        (date_str,)
+    )
+    conn.execute("DELETE FROM rollup_day_item WHERE period_start = ?", (date_str,))
+    conn.execute(
+        "INSERT INTO rollup_day_item (period_start, category, item, minutes) "
+        "SELECT date, category, item, SUM(minutes) FROM records WHERE date = ? GROUP BY date, category, item",
+        (date_str,)
+    )
+    # 周和月的汇总只需要从这个周期内最多31天的日汇总重新相加
+    for granularity in ('week', 'month'):
+        table = ROLLUP_TABLES[granularity]
+        start, end = period_bounds(date_str, granularity)
+        conn.execute(f"DELETE FROM {table} WHERE period_start = ?", (start,))
+        conn.execute(
+            f"INSERT INTO {table} (period_start, category, minutes) "
+            "SELECT ?, category, SUM(minutes) FROM rollup_day_category "
+            "WHERE period_start BETWEEN ? AND ? GROUP BY category",
+            (start, start, end)
+        )
+
+def rebuild_rollups(conn):
+    """根据全部记录重建所有预聚合表（用于迁移或表结构升级）。"""
+    with conn:
+        for table in ('rollup_day_category', 'rollup_day_item', 'rollup_week_category', 'rollup_month_category'):
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute(
+            "INSERT INTO rollup_day_category (period_start, category, minutes) "
+            "SELECT date, category, SUM(minutes) FROM records GROUP BY date, category"
+        )
+        conn.execute(
+            "INSERT INTO rollup_day_item (period_start, category, item, minutes) "
+            "SELECT date, category, item, SUM(minutes) FROM records GROUP BY date, category, item"
+        )
+        day_totals = conn.execute("SELECT period_start, category, minutes FROM rollup_day_category").fetchall()
+        for granularity in ('week', 'month'):
+            totals = {}
+            for date_str, category, minutes in day_totals:
+                key = (period_bounds(date_str, granularity)[0], category)
+                totals[key] = totals.get(key, 0) + minutes
+            conn.executemany(
+                f"INSERT INTO {ROLLUP_TABLES[granularity]} (period_start, category, minutes) VALUES (?, ?, ?)",
+                [(start, category, minutes) for (start, category), minutes in totals.items()]
+            )
+        set_meta(conn, 'rollups_version', ROLLUPS_VERSION)
+
+def encode_minutes(minutes):
+    """把分钟偏移数组编码为紧凑的 BLOB（小端 uint16，每个时间点2字节）。超出 0~65535 的值会引发 ValueError。"""
+    out_of_range = [value for value in minutes if not 0 <= value <= MAX_TIMESTAMP_MINUTES]
+    if out_of_range:
+        raise ValueError(f"打点时间超出可保存的范围 (0~{MAX_TIMESTAMP_MINUTES} 分钟): {out_of_range[0]}")
+    values = array('H', minutes)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+def decode_minutes(blob):
+    """encode_minutes 的逆过程，返回分钟偏移列表。"""
+    values = array('H')
+    values.frombytes(blob)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tolist()
+
+def upsert_day(date_str, rows, db_file=DB_FILE, timestamps=None):
+    """
+    用新数据替换某一天的全部记录，并同步更新预聚合表。
+    rows 为 (category, item, task, minutes) 列表；删除和写入在同一个事务中完成，
+    借助日期索引，只涉及当天的记录，与历史总量无关。
+    timestamps 为当天打点时间的分钟偏移（相对当天 0 点，跨过午夜时大于 1440），同样整体替换。
+    """
+    with closing(connect(db_file)) as conn:
+        with conn:
+            conn.execute("DELETE FROM records WHERE date = ?", (date_str,))
+            conn.executemany(
+                "INSERT INTO records (date, category, item, task, minutes) VALUES (?, ?, ?, ?, ?)",
+                [(date_str, category, item, task, int(minutes)) for category, item, task, minutes in rows]
+            )
+            refresh_day_rollups(conn, date_str)
+            conn.execute("DELETE FROM day_timestamps WHERE date = ?", (date_str,))
+            if timestamps:
+                conn.execute("INSERT INTO day_timestamps (date, minutes) VALUES (?, ?)",
+                             (date_str, encode_minutes(timestamps)))
+
+def fetch_records(conn, start=None, end=None):
+    """按日期顺序返回 (date, category, item, task, minutes) 记录，可选地限定日期范围（含两端）。"""
+    query = "SELECT date, category, item, task, minutes FROM records"
+    conditions = []
+    params = []
+    if start:
+        conditions.append("date >= ?")
+        params.append(start)
+    if end:
+        conditions.append("date <= ?")
+        params.append(end)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY date, id"
+    return conn.execute(query, params).fetchall()
+
+def fetch_timestamps(conn, start=None, end=None):
+    """按日期顺序返回 (date, [分钟偏移, ...])，可选地限定日期范围（含两端）。"""
+    query = "SELECT date, minutes FROM day_timestamps"
+    conditions = []
+    params = []
+    if start:
+        conditions.append("date >= ?")
+        params.append(start)
+    if end:
+        conditions.append("date <= ?")
+        params.append(end)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY date"
+    return [(date_str, decode_minutes(blob)) for date_str, blob in conn.execute(query, params)]
+
+def fetch_category_rollup(conn, granularity='day', start=None, end=None):
+    """
+    读取 日/周/月 × 类别 的预聚合数据，返回 (period_start, category, minutes)。
+    start/end 按周期第一天筛选（含两端）。
+    """
+    query = f"SELECT period_start, category, minutes FROM {ROLLUP_TABLES[granularity]}"
+    conditions = []
+    params = []
+    if start:
+        conditions.append("period_start >= ?")
+        params.append(start)
+    if end:
+        conditions.append("period_start <= ?")
+        params.append(end)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY period_start, category"
+    return conn.execute(query, params).fetchall()
+
+def fetch_item_totals(conn, start=None, end=None):
+    """从 日×子项 预聚合表汇总一个日期范围内每个 (类别, 子项) 的总时长。"""
+    query = "SELECT category, item, SUM(minutes) FROM rollup_day_item"
+    conditions = []
+    params = []
+    if start:
+        conditions.append("period_start >= ?")
+        params.append(start)
+    if end:
+        conditions.append("period_start <= ?")
+        params.append(end)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " GROUP BY category, item ORDER BY category, item"
+    return conn.execute(query, params).fetchall()
+
+def load_dataframe(start=None, end=None, db_file=DB_FILE):
+    """读取历史记录为DataFrame，列名与旧CSV保持一致。"""
+    import pandas as pd
+
+    with closing(connect(db_file)) as conn:
+        rows = fetch_records(conn, start, end)
+    return pd.DataFrame(rows, columns=HEADER)
+
+def export_csv(csv_file, db_file=DB_FILE):
+    """把数据库中的全部历史导出为CSV（先写临时文件再重命名，不会留下半个文件）。"""
+    tmp_file = csv_file + '.tmp'
+    with closing(connect(db_file)) as conn:
+        with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            writer.writerows(conn.execute("SELECT date, category, item, task, minutes FROM records ORDER BY date, id"))
+    os.replace(tmp_file, csv_file)
+    print(f"历史数据已导出到 '{csv_file}'。")
+
+def main():
+    """命令行入口：迁移或导出历史数据。"""
+    parser = argparse.ArgumentParser(description="管理历史数据库 (data/history.db)。")
+    parser.add_argument('--migrate', action='store_true', help="从 historical_data.csv 重新导入全部历史（覆盖数据库中的记录）。")
+    parser.add_argument('--export-csv', type=str, help="把数据库导出为CSV文件，便于用表格软件查看。")
+    args = parser.parse_args()
+
+    if args.migrate:
+        with closing(connect(DB_FILE, csv_file=None)) as conn:
+            migrate_from_csv(conn, CSV_FILE)
+    if args.export_csv:
+        export_csv(args.export_csv)
+    if not args.migrate and not args.export_csv:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import build_report
+import pipeline
+import process_log
+import report_assets
+import report_manifest
+import report_options
+
+# 检查 log.md 是否变化的间隔，以及保存后等待文件稳定的时间（秒）；只比较 mtime 和大小，与日志长度无关
+POLL_INTERVAL = 0.1
+DEBOUNCE = 0.15
+# 预览服务器的端口；报告页面通过它轮询 live-reload.json，在自己被重新生成后自动刷新
+DEFAULT_PORT = 8765
+LIVE_RELOAD_FILE = 'live-reload.json'
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """不缓存、不输出访问日志的静态文件服务。"""
+
+    def end_headers(self):
+        self.send_header('Cache-Control', 'no-store')
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(port):
+    """在后台线程中启动只监听本机的预览服务器（根目录为 reports/），端口被占用时返回 None。"""
+    handler = functools.partial(QuietHandler, directory=os.path.abspath(report_assets.REPORTS_DIR))
+    try:
+        server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    except OSError as e:
+        print(f"无法启动预览服务器 (端口 {port}): {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def report_url(port, report_file):
+    """报告在预览服务器上的地址。"""
+    return f"http://127.0.0.1:{port}/{os.path.basename(report_file)}"
+
+def file_signature(path):
+    """文件的 (mtime_ns, size)，文件不存在时返回 None。"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def chunk_digest(chunk):
+    """
+    一天日志文本的哈希。忽略行尾和末尾的空白：在后面追加新的一天时，前一天末尾的空行会变化，
+    但它的内容没有变，不应该被重新处理。
+    """
+    text = '\n'.join(line.rstrip() for line in chunk.strip().splitlines())
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+class LogWatcher:
+    """记录 log.md 中每一天的文本哈希，只重新解析、写入和渲染文本发生变化的日子。"""
+
+    def __init__(self, log_file, options=None, port=DEFAULT_PORT):
+        self.log_file = log_file
+        self.port = port
+        # 只有通过预览服务器打开的页面才能轮询刷新状态
+        self.options = report_options.make_options({**(options or {}), "live_reload": bool(port)})
+        self.known = set()
+        self.versions = {}
+
+    def read_chunks(self):
+        """读取日志并按日期切分，返回 { 文本哈希: 文本 }。"""
+        with open(self.log_file, 'r', encoding='utf-8') as f:
+            return {chunk_digest(chunk): chunk for chunk in process_log.split_log_days(f.read())}
+
+    def initial_sync(self):
+        """
+        启动时的同步：摘要与清单记录一致的日子已经写入并渲染过，直接跳过；
+        最后一天总是重新渲染一次，使它带上自动刷新的脚本，方便在浏览器中打开。
+        """
+        chunks = self.read_chunks()
+        manifest = report_manifest.load_manifest()
+        changed, latest = [], None
+        for chunk in chunks.values():
+            for summary_data, _ in process_log.parse_log_days(chunk):
+                if not summary_data['daily_details']:
+                    continue
+                latest = summary_data
+                entry = manifest.get(summary_data['report_date'], {})
+                if entry.get('summary') != report_manifest.summary_digest(summary_data):
+                    changed.append(chunk)
+                    break
+        reports = self.update(changed)
+        self.known = set(chunks)
+        if latest is not None and latest['report_date'] not in {date for date, _ in reports}:
+            reports.append((latest['report_date'], build_report.build_daily_report(latest, False, self.options)))
+            self.publish(reports[-1:])
+        return reports
+
+    def poll(self):
+        """日志有变化时处理变化的日子，返回 [(日期, 报告路径), ...]。"""
+        chunks = self.read_chunks()
+        changed = [chunk for digest, chunk in chunks.items() if digest not in self.known]
+        # 处理成功后才记下新的哈希：出错的日子在下次保存时会重新处理
+        reports = self.update(changed)
+        self.known = set(chunks)
+        return reports
+
+    def update(self, chunks):
+        """解析并写入这些日子（全部写入后再渲染，保证趋势图包含本次的全部修改），然后重新生成它们的报告。"""
+        days = []
+        for chunk in chunks:
+            days.extend(pipeline.ingest_log(chunk))
+        reports = [(summary_data['report_date'], build_report.build_daily_report(summary_data, False, self.options))
+                   for summary_data, _ in days]
+        self.publish(reports)
+        return reports
+
+    def publish(self, reports):
+        """更新 live-reload.json 中这些报告的版本号，打开着的页面会据此自动刷新。"""
+        if not self.port or not reports:
+            return
+        version = time.time_ns()
+        for _, report_file in reports:
+            self.versions[os.path.basename(report_file)] = version
+        report_assets.write_if_changed(os.path.join(report_assets.REPORTS_DIR, LIVE_RELOAD_FILE),
+                                       json.dumps({"reports": self.versions}, sort_keys=True))
+
+    def print_reports(self, reports, elapsed):
+        """打印本次重新生成的报告及耗时。"""
+        for date_str, report_file in reports:
+            location = report_url(self.port, report_file) if self.port else report_file
+            print(f"{date_str}: {location}")
+        print(f"已更新 {len(reports)} 天，用时 {elapsed:.2f} 秒。")
+
+    def run(self, poll_interval=POLL_INTERVAL, debounce=DEBOUNCE):
+        """持续监视日志文件，直到按下 Ctrl+C。"""
+        server = start_server(self.port) if self.port else None
+        if server is None and self.port:
+            self.port = 0
+            self.options['live_reload'] = False
+
+        start = time.perf_counter()
+        signature = file_signature(self.log_file)
+        if signature is not None:
+            try:
+                self.print_reports(self.initial_sync(), time.perf_counter() - start)
+            except (OSError, RuntimeError, ValueError) as e:
+                print(f"更新失败: {e}")
+        print(f"正在监视 '{self.log_file}'，保存后自动更新报告，按 Ctrl+C 退出。")
+
+        try:
+            while True:
+                time.sleep(poll_interval)
+                current = file_signature(self.log_file)
+                if current == signature or current is None:
+                    continue
+                # 编辑器保存时可能分几次写入：等文件在 debounce 时间内不再变化后再读取
+                while True:
+                    time.sleep(debounce)
+                    settled = file_signature(self.log_file)
+                    if settled == current:
+                        break
+                    current = settled
+                signature = current
+                start = time.perf_counter()
+                try:
+                    reports = self.poll()
+                except (OSError, RuntimeError, ValueError) as e:
+                    # 例如时长写错（'2hm'）或超出范围：保留监视，改正后保存即可重试
+                    print(f"更新失败: {e}")
+                    continue
+                if reports:
+                    self.print_reports(reports, time.perf_counter() - start)
+        except KeyboardInterrupt:
+            print("已停止监视。")
+        finally:
+            if server is not None:
+                server.shutdown()
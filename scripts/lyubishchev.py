@@ -0,0 +1,59 @@
+import argparse
+import os
+import runpy
+import sys
+
+# 子命令 → (实际执行的脚本模块, 插在用户参数前面的参数)
+# 各脚本只在被选中时才导入，启动时不会加载 pandas、Jinja 或 Tkinter
+COMMANDS = {
+    'parse': ('process_log', [], "解析 log.md 并写入历史数据（参数同 process_log.py）。"),
+    'daily': ('report_worker', ['daily'], "解析日志并逐日生成每日报告（参数同 report_worker.py daily）。"),
+    'period': ('report_worker', ['period'], "生成周期报告（参数同 report_worker.py period）。"),
+    'watch': ('pipeline', ['daily', '--watch'], "监视 log.md，保存后自动更新报告并刷新页面（参数同 pipeline.py daily）。"),
+    'search': ('history_search', [], "在全部历史的子项和任务名中搜索并统计耗时（参数同 history_search.py）。"),
+    'build': ('build_report', [], "从摘要或历史数据生成每日报告（参数同 build_report.py，如 --dates、--status）。"),
+    'gui': ('run_app', [], "打开图形界面。"),
+}
+
+# 值为文件或目录路径的参数：切换到项目根目录前按调用时的当前目录转为绝对路径
+# （周期报告的 --output 只是 reports/ 下的文件名，不在此列）
+PATH_OPTIONS = ('--log', '--summary', '--summaries-dir', '--profile-output')
+
+
+def get_project_root():
+    """项目根目录（scripts 的上一级）。"""
+    return os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
+
+def absolute_paths(args, cwd):
+    """把 args 中 PATH_OPTIONS 的值（--log FILE 或 --log=FILE 两种写法）转为相对于 cwd 的绝对路径。"""
+    result = []
+    expect_path = False
+    for arg in args:
+        option, sep, value = arg.partition('=')
+        if expect_path:
+            arg = os.path.abspath(os.path.join(cwd, arg))
+        elif sep and option in PATH_OPTIONS:
+            arg = f"{option}={os.path.abspath(os.path.join(cwd, value))}"
+        expect_path = arg in PATH_OPTIONS
+        result.append(arg)
+    return result
+
+def main():
+    """统一的命令行入口：lyubishchev <子命令> [参数...]，把参数原样转交给对应的脚本。"""
+    parser = argparse.ArgumentParser(
+        prog='lyubishchev', description="柳比歇夫时间统计工具。子命令的参数与对应脚本相同，可用 lyubishchev <子命令> --help 查看。",
+        epilog="\n".join(f"  {name:<8}{help_text}" for name, (_, _, help_text) in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=COMMANDS, help="要执行的子命令。")
+    parser.add_argument('args', nargs=argparse.REMAINDER, help="传给子命令的参数。")
+    args = parser.parse_args()
+
+    module, prefix = COMMANDS[args.command][:2]
+    # 各脚本使用相对于项目根目录的路径 (data/, reports/, templates/)；用户给出的路径仍相对于当前目录
+    user_args = absolute_paths(args.args, os.getcwd())
+    os.chdir(get_project_root())
+    sys.argv = [f"lyubishchev {args.command}", *prefix, *user_args]
+    runpy.run_module(module, run_name='__main__', alter_sys=True)
+
+if __name__ == "__main__":
+    main()
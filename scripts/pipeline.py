@@ -0,0 +1,109 @@
+import argparse
+
+import process_log
+import build_report
+import generate_periodic_report
+import report_options
+import timing
+
+
+def ingest_log(log_text):
+    """
+    解析（可能包含多天的）日志文本，并逐日写入历史数据库。
+    返回 [(summary_data, log_date), ...]；只有日期标题、没有任何记录的日子会被跳过。
+    """
+    with timing.stage('解析日志'):
+        parsed_days = process_log.parse_log_days(log_text)
+    days = []
+    for summary_data, log_date in parsed_days:
+        if not summary_data['daily_details']:
+            continue
+        process_log.append_to_csv(summary_data, log_date)
+        days.append((summary_data, log_date))
+    return days
+
+def render_daily(log_text, force=False, options=None):
+    """
+    在当前进程内完成 解析 → 写入历史 → 渲染 的整个流程，每一天生成一份每日报告。
+    解析结果直接传给渲染函数，不再经过 summary.json；内容没有变化的日子不会重新渲染（force=True 时全部重新生成）。
+    options 为输出选项（见 report_options）。返回报告路径列表（按日志中的顺序）。
+    """
+    # 先写入所有日期，再渲染，保证每份报告的历史趋势都包含本次新增的全部日期
+    days = ingest_log(log_text)
+    return [build_report.build_daily_report(summary_data, force, options) for summary_data, _ in days]
+
+def render_period(start=None, end=None, period=None, output=None, options=None):
+    """
+    生成周期报告。可以传入起止日期 ('YYYY-MM-DD' 或日期对象)，或预设周期 'week'/'month'/'last7days'。
+    返回报告路径；周期内没有数据时返回 None。
+    """
+    start_date, end_date = generate_periodic_report.resolve_period(period, start, end)
+    if not start_date or not end_date:
+        raise ValueError("请提供一个有效的报告周期。")
+    return generate_periodic_report.build_periodic_report(start_date, end_date, period or 'custom', output, options)
+
+def main():
+    """命令行入口：在一个进程内生成每日报告或周期报告。"""
+    parser = argparse.ArgumentParser(description="在一个进程内生成每日报告或周期报告。")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    daily_parser = subparsers.add_parser('daily', help="解析日志并逐日生成每日报告。")
+    daily_parser.add_argument('--log', type=str, default='data/log.md', help="日志文件路径。")
+    daily_parser.add_argument('--force', action='store_true', help="即使内容没有变化也重新生成报告。")
+    daily_parser.add_argument('--watch', action='store_true',
+                              help="持续监视日志文件：保存后只重新解析、写入并渲染内容有变化的日子，打开的报告页面自动刷新。")
+    daily_parser.add_argument('--port', type=int,
+                              help="--watch 模式下预览服务器的端口（默认 8765），0 表示不启动服务器（页面不会自动刷新）。")
+
+    period_parser = subparsers.add_parser('period', help="生成周期报告。")
+    period_parser.add_argument('--period', type=str, choices=['week', 'month', 'last7days'], help="预设的报告周期。")
+    period_parser.add_argument('--start', type=str, help="报告周期的开始日期 (YYYY-MM-DD)。")
+    period_parser.add_argument('--end', type=str, help="报告周期的结束日期 (YYYY-MM-DD)。")
+    period_parser.add_argument('--output', type=str, help="（可选）指定输出的HTML文件名。")
+    for subparser in (daily_parser, period_parser):
+        report_options.add_arguments(subparser)
+        timing.add_arguments(subparser)
+
+    args = parser.parse_args()
+    with timing.profiling(args):
+        run(args)
+
+def run(args):
+    """按命令行参数生成每日报告或周期报告。"""
+    options = report_options.from_args(args)
+
+    if args.command == 'daily' and args.watch:
+        import log_watcher
+
+        port = log_watcher.DEFAULT_PORT if args.port is None else args.port
+        log_watcher.LogWatcher(args.log, options, port).run()
+        return
+
+    if args.command == 'daily':
+        try:
+            with open(args.log, 'r', encoding='utf-8') as f:
+                log_text = f.read()
+        except FileNotFoundError:
+            print(f"错误：日志文件 '{args.log}' 不存在。")
+            return
+        try:
+            report_files = render_daily(log_text, args.force, options)
+        except RuntimeError as e:
+            print(f"错误: {e}")
+            return
+        if not report_files:
+            print("未找到有效的日志内容。")
+        for report_file in report_files:
+            # Standardize the output for easy parsing by the GUI
+            print(f"--> {report_file}")
+    else:
+        try:
+            report_file = render_period(args.start, args.end, args.period, args.output, options)
+        except ValueError as e:
+            print(f"错误: {e}")
+            return
+        if report_file:
+            print(f"--> {report_file}")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 import re
 import json
 from collections import defaultdict
-from datetime import datetime
+from datetime import date, datetime
 import os
-import csv
+import argparse
+
+import history_store
+import timing
 
 def time_str_to_minutes(time_str):
     """将'XhYm'格式的字符串转换为分钟。"""
@@ -31,80 +34,166 @@ def minutes_to_time_str(minutes):
     else:
         return f"{mins}m"
 
-def parse_log_content(log_content):
-    """解析日志内容，计算时间总和，并提取详细的任务条目和日期。"""
-    # 结构：{ category: { item: { 'total_minutes': total_minutes, 'tasks': [{'name': task_name, 'time_str': time_str}] } } }
-    item_details = defaultdict(lambda: defaultdict(lambda: {'total_minutes': 0, 'tasks': []}))
-    
-    # 默认使用当前日期，但会尝试从日志中解析
-    log_date = datetime.now()
-    date_pattern = re.compile(r'^\s*##\s*(\d{1,2})\.(\d{1,2})\s*$')
-    
-    current_category = None
-    category_pattern = re.compile(r'^\s*-\s*([一二三四五六七八九十]+、[\u4e00-\u9fa5]+)\s*$')
-    item_pattern = re.compile(r'^\s+-\s*([\u4e00-\u9fa5]+)\s*[\(（](.*)[\)）]\s*$')
-    
-    for line in log_content.strip().split('\n'):
-        line_content = line.strip()
-        if not line_content:
+# --- 预编译的正则表达式 ---
+# 日期标题：'## 月.日'，或带年份的 '## 年-月-日' / '## 年.月.日'
+DATE_PATTERN = re.compile(r'^\s*##\s*(?:(\d{4})[.-](\d{1,2})[.-](\d{1,2})|(\d{1,2})\.(\d{1,2}))\s*$')
+CATEGORY_PATTERN = re.compile(r'^\s*-\s*([一二三四五六七八九十]+、[\u4e00-\u9fa5]+)\s*$')
+ITEM_PATTERN = re.compile(r'^\s+-\s*([\u4e00-\u9fa5]+)\s*[\(（](.*)[\)）]\s*$')
+# 时间是 hh mm 或者 mm 格式
+DURATION_PATTERN = re.compile(r'\d+h\d*m?|\d+m')
+# 打点时间行：一行里只有若干个 '时.分'，例如 '9.30 9.43 %7.42'；'%' 表示省略了小时的十位，'/' 为手写的标记
+TIMESTAMP_TOKEN = re.compile(r'[/%]?\d{1,2}\.\d{2,3}')
+TIMESTAMP_PATTERN = re.compile(r'(%?)(\d{1,2})\.(\d{2})')
+
+def tokenize_tasks(content):
+    """
+    将条目括号内的内容切分为 (任务名, 时间) 对。
+    任务名是上一个时间之后、下一个时间之前的文本（至少一个字符），紧贴时间的空白和'-'不计入任务名。
+    每次只向前搜索下一个时间，因此整个切分是线性扫描，不会在长行上回溯。
+    """
+    pos = 0
+    length = len(content)
+    while pos < length:
+        match = DURATION_PATTERN.search(content, pos + 1)
+        if not match:
+            break
+        name_end = match.start()
+        while name_end > pos + 1 and (content[name_end - 1].isspace() or content[name_end - 1] == '-'):
+            name_end -= 1
+        yield content[pos:name_end], match.group()
+        pos = match.end()
+
+def parse_item_tasks(content):
+    """解析一个条目的任务列表，合并由+连接的时间，例如 '作业17m+28m'。"""
+    tasks = []
+    for name, time in tokenize_tasks(content):
+        task_name = name.strip()
+        if task_name == '+' and tasks:
+            # 如果任务名是"+"，则将时间添加到上一个任务
+            tasks[-1]['minutes'] += time_str_to_minutes(time)
+        else:
+            tasks.append({'name': task_name, 'minutes': time_str_to_minutes(time)})
+    return [task for task in tasks if task['minutes'] > 0]
+
+def parse_timestamps(content, previous=None):
+    """
+    把一行打点时间解析为递增的分钟偏移（相对当天 0 点）。
+    跨过午夜的时间顺延到第二天（例如 23.36 之后的 00.50 记为 24*60+50）；
+    '%7.42' 这样省略了十位的时间取上一个时间之后、个位为 7 的第一个小时。
+    格式不对的时间（如 '20.302'）被跳过。previous 为同一天上一行的最后一个时间。
+    """
+    minutes = []
+    for token in content.split():
+        match = TIMESTAMP_PATTERN.fullmatch(token.lstrip('/'))
+        if not match or int(match.group(3)) > 59:
             continue
+        hour, minute = int(match.group(2)), int(match.group(3))
+        if match.group(1):
+            if previous is None:
+                continue
+            # 从上一个时间的小时开始向后找个位相同的小时（跨过午夜时按 0 点起重新计数）
+            hour = previous // 60
+            while (hour % 24) % 10 != int(match.group(2)) % 10 or hour * 60 + minute < previous:
+                hour += 1
+            offset = hour * 60 + minute
+        else:
+            offset = hour * 60 + minute
+            while previous is not None and offset < previous:
+                offset += 24 * 60
+        minutes.append(offset)
+        previous = offset
+    return minutes
 
-        # 尝试匹配日期
-        date_match = date_pattern.match(line_content)
-        if date_match:
-            try:
-                month = int(date_match.group(1))
-                day = int(date_match.group(2))
-                current_year = datetime.now().year
-                log_date = datetime(current_year, month, day)
-            except ValueError:
-                # 如果日期格式错误，则忽略并使用默认的当天日期
-                pass
-            continue # 处理完日期行后跳过
-        
-        category_match = category_pattern.match(line)
-        if category_match:
-            full_title = category_match.group(1)
-            current_category = full_title.split('、')[1]
+def header_date(line):
+    """如果该行是日期标题，返回 (年, 月, 日)（'## 月.日' 没有写年份，年为 None），否则返回 None。"""
+    date_match = DATE_PATTERN.match(line.strip())
+    if not date_match:
+        return None
+    year, month, day, short_month, short_day = date_match.groups()
+    if year is None:
+        return None, int(short_month), int(short_day)
+    return int(year), int(month), int(day)
+
+def resolve_header_dates(headers, today=None):
+    """
+    为按时间顺序排列的日期标题 [(年, 月, 日), ...] 推断年份，返回 [datetime 或 None, ...]（日期无效时为 None）。
+    从最后一个标题倒推：它的年份取不晚于今天的那一年；往前每遇到 月.日 比后一个标题大，说明跨过了年，年份减一。
+    写了年份的标题直接使用该年份，并作为更早标题的推算起点。
+    """
+    today = today or date.today()
+    dates = [None] * len(headers)
+    year = None
+    later = None
+    for index in range(len(headers) - 1, -1, -1):
+        explicit_year, month, day = headers[index]
+        if explicit_year is not None:
+            year = explicit_year
+        elif year is None:
+            year = today.year if (month, day) <= (today.month, today.day) else today.year - 1
+        elif later is not None and (month, day) > later:
+            year -= 1
+        try:
+            dates[index] = datetime(year, month, day)
+        except ValueError:
+            # 日期格式错误（如 2.30），不参与年份推算
             continue
+        later = (month, day)
+    return dates
 
-        item_match = item_pattern.match(line)
-        if item_match and current_category:
-            item_name = item_match.group(1)
-            content = item_match.group(2).strip()
-            
-            # 更精细地解析任务和时间
-            # 正则表达式找到所有 "任务名+时间" 的组合
-            # 任务名可以包含空格，但不包含'（'和'）'
-            # 时间是 hh mm 或者 mm 格式
-            pattern = re.compile(r'([\s\S]+?)(?:\s|-)*?(\d+h\d*m?|\d+m)')
-            matches = pattern.findall(content)
-
-            tasks = []
-            # 合并由+连接的同名任务
-            for i, (name, time) in enumerate(matches):
-                task_name = name.strip()
-                if task_name == '+' and tasks:
-                    # 如果任务名是"+"，则将时间添加到上一个任务
-                    tasks[-1]['time_str'] += f"+{time}"
-                else:
-                    tasks.append({'name': task_name, 'time_str': time})
-
-            # 处理 `+` 连接的时间字符串, 例如 "1h+12m"
-            processed_tasks = []
-            for task in tasks:
-                # 将 '17m+28m' 这样的字符串中的时间相加
-                individual_times = re.findall(r'\d+h\d*m?|\d+m', task['time_str'])
-                total_minutes = sum(time_str_to_minutes(ts) for ts in individual_times)
-                
-                if total_minutes > 0:
-                    processed_tasks.append({'name': task['name'], 'minutes': total_minutes})
-
-            for p_task in processed_tasks:
-                item_details[current_category][item_name]['tasks'].append(p_task)
-                item_details[current_category][item_name]['total_minutes'] += p_task['minutes']
-
-    # --- 计算总计和格式化输出 ---
+def log_header_dates(lines, today=None):
+    """日志中每个日期标题（按出现顺序）对应的日期，见 resolve_header_dates。"""
+    return resolve_header_dates([header for header in map(header_date, lines) if header], today)
+
+def parse_line(line):
+    """
+    识别单行日志，返回 (类型, 值)：
+    ('date', (年或None, 月, 日))、('category', 主类名)、('item', (条目名, 任务列表))、
+    ('timestamps', 打点时间的原文)，无法识别的行返回 None。
+    日期标题的年份和有效性由 resolve_header_dates 结合前后的标题确定。
+    """
+    line = line.rstrip('\r\n')
+    line_content = line.strip()
+    if not line_content:
+        return None
+
+    # 尝试匹配日期
+    header = header_date(line_content)
+    if header:
+        return 'date', header
+
+    category_match = CATEGORY_PATTERN.match(line)
+    if category_match:
+        return 'category', category_match.group(1).split('、')[1]
+
+    item_match = ITEM_PATTERN.match(line)
+    if item_match:
+        return 'item', (item_match.group(1), parse_item_tasks(item_match.group(2).strip()))
+
+    tokens = line_content.split()
+    if len(tokens) >= 2 and all(TIMESTAMP_TOKEN.fullmatch(token) for token in tokens):
+        return 'timestamps', line_content
+
+    return None
+
+def new_item_details():
+    """结构：{ category: { item: { 'total_minutes': total_minutes, 'tasks': [{'name': task_name, 'minutes': minutes}] } } }"""
+    return defaultdict(lambda: defaultdict(lambda: {'total_minutes': 0, 'tasks': []}))
+
+def add_item_tasks(item_details, category, item_name, tasks):
+    """把一个条目的任务累加到 item_details 中。"""
+    for task in tasks:
+        item_details[category][item_name]['tasks'].append(task)
+        item_details[category][item_name]['total_minutes'] += task['minutes']
+
+def add_timestamps(timeline, content):
+    """把一行打点时间接在当天已有的时间之后。"""
+    timeline.extend(parse_timestamps(content, timeline[-1] if timeline else None))
+
+def build_summary(item_details, log_date, timeline=None):
+    """
+    根据 item_details 计算总计，生成与 summary.json 相同格式的输出。
+    timeline 为当天打点时间的分钟偏移，有记录时写入 "timeline"。
+    """
     final_data = defaultdict(dict)
     daily_details_structured = defaultdict(lambda: defaultdict(list))
     grand_total_minutes = 0
@@ -137,66 +226,255 @@ def parse_log_content(log_content):
 
     # 为了保持和data.json一样的格式，将总计移动到 "daily_summary" 内部
     output_json["daily_summary"]["总计"] = output_json.pop("总计")
+    if timeline:
+        output_json["timeline"] = list(timeline)
+
+    return output_json
+
+def parse_log_content(log_content):
+    """解析日志内容，计算时间总和，并提取详细的任务条目和日期。"""
+    item_details = new_item_details()
+    timeline = []
+    
+    # 默认使用当前日期，但会尝试从日志中解析
+    log_date = datetime.now()
+    current_category = None
+    
+    lines = log_content.strip().split('\n')
+    dates = iter(log_header_dates(lines))
+    for line in lines:
+        parsed = parse_line(line)
+        if parsed is None:
+            continue
+        kind, value = parsed
 
-    return output_json, log_date
+        if kind == 'date':
+            value = next(dates)
+            # 如果日期格式错误，则忽略并使用之前的日期
+            if value is not None:
+                log_date = value
+                # 打点时间只属于最后一个日期：每个新日期重新开始，否则各天的时间会被接成一条跨越多天的时间线
+                timeline = []
+        elif kind == 'category':
+            current_category = value
+        elif kind == 'item' and current_category:
+            item_name, tasks = value
+            add_item_tasks(item_details, current_category, item_name, tasks)
+        elif kind == 'timestamps':
+            add_timestamps(timeline, value)
 
-def append_to_csv(summary_data, log_date):
+    return build_summary(item_details, log_date, timeline), log_date
+
+def iter_log_days(lines, dates=None):
     """
-    将每日总结追加到CSV文件中。
-    此函数现在是幂等的：如果当天的数据已存在，它会先删除旧数据，再写入新数据。
+    流式解析日志：逐行读取（可直接传入文件对象），每遇到一个 `## 月.日` 标题就开始新的一天，
+    每解析完一天就产出一个 (summary_data, log_date)。内存占用只与单日内容有关。
+    dates 为 log_header_dates 预先推算的标题日期（用于推断年份）；未给出时先读入全部行再推算。
+    日期无效的标题不切分，内容归入前一天；第一个有效标题之前的内容和重复出现的日期会被跳过并给出提示。
     """
-    csv_file = 'data/historical_data.csv'
-    date_str = log_date.strftime('%Y-%m-%d')
-    file_exists = os.path.isfile(csv_file)
-
-    rows_to_keep = []
-    header = ['Date', 'Category', 'Item', 'Task', 'Task Duration (minutes)']
-
-    if file_exists:
-        with open(csv_file, 'r', newline='', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            try:
-                # 保留表头和不属于当天的数据
-                header = next(reader)
-                rows_to_keep = [row for row in reader if row and row[0] != date_str]
-            except StopIteration:
-                # 文件为空或只有表头
-                pass
-
-    # 准备当天的新数据
-    new_rows = []
+    if dates is None:
+        lines = list(lines)
+        dates = log_header_dates(lines)
+    dates = iter(dates)
+    seen = set()
+    item_details = new_item_details()
+    timeline = []
+    log_date = None
+    current_category = None
+    skipped_preamble = False
+
+    for line in lines:
+        parsed = parse_line(line)
+        if parsed is None:
+            continue
+        kind, value = parsed
+
+        if kind == 'date':
+            value = next(dates)
+            if value is None:
+                # 日期格式错误的标题不切分，内容继续归入当前这一天
+                continue
+            if log_date is not None:
+                yield build_summary(item_details, log_date, timeline), log_date
+            item_details = new_item_details()
+            timeline = []
+            current_category = None
+            if value in seen:
+                # 同一天出现两次时不能用后一段覆盖前一段，跳过它直到下一个日期标题
+                print(f"警告：日期 {value.strftime('%Y-%m-%d')} 重复出现，后面的这一段已跳过。")
+                log_date = None
+                continue
+            seen.add(value)
+            log_date = value
+        elif log_date is None:
+            skipped_preamble = skipped_preamble or not seen
+            continue
+        elif kind == 'category':
+            current_category = value
+        elif kind == 'item' and current_category:
+            item_name, tasks = value
+            add_item_tasks(item_details, current_category, item_name, tasks)
+        elif kind == 'timestamps':
+            add_timestamps(timeline, value)
+
+    if log_date is not None:
+        yield build_summary(item_details, log_date, timeline), log_date
+    if skipped_preamble:
+        print("警告：第一个日期标题之前的内容没有日期，已跳过。")
+
+def split_log_days(log_content, today=None):
+    """
+    按日期标题把日志文本切成每天一段，与 iter_log_days 解析整个日志的结果一致：
+    每段的标题改写为推算出年份的 '## 年-月-日'，单独解析时也能得到同一个日期；
+    日期无效的标题留在前一段中，第一个有效标题之前的内容和重复的日期被跳过；只有标题没有内容的日子也会被跳过。
+    """
+    lines = log_content.splitlines(keepends=True)
+    dates = iter(log_header_dates(lines, today))
+    chunks = []
+    current = None
+    seen = set()
+    skipped_preamble = False
+
+    def flush():
+        if current and ''.join(current[1:]).strip():
+            chunks.append(''.join(current))
+
+    for line in lines:
+        value = next(dates) if header_date(line) else None
+        if value is None:
+            if current is not None:
+                current.append(line)
+            elif line.strip() and not seen:
+                skipped_preamble = True
+            continue
+        flush()
+        if value in seen:
+            print(f"警告：日期 {value.strftime('%Y-%m-%d')} 重复出现，后面的这一段已跳过。")
+            current = None
+            continue
+        seen.add(value)
+        current = [f"## {value.strftime('%Y-%m-%d')}\n"]
+    flush()
+    if skipped_preamble:
+        print("警告：第一个日期标题之前的内容没有日期，已跳过。")
+    return chunks
+
+def parse_log_days(log_content):
+    """按日期标题把多天的日志拆开解析，返回 [(summary_data, log_date), ...]，每一天一项。"""
+    return list(iter_log_days(log_content.splitlines()))
+
+def summary_to_rows(summary_data):
+    """把单日摘要展开为 (category, item, task, minutes) 行。"""
+    rows = []
     for category, items in summary_data.get('daily_details', {}).items():
         for item, tasks in items.items():
             if not tasks:
                 total_time_str = summary_data.get('daily_summary', {}).get(category, {}).get(item, '0m')
                 total_minutes = time_str_to_minutes(total_time_str)
-                new_rows.append([date_str, category, item, "N/A", total_minutes])
+                rows.append((category, item, "N/A", total_minutes))
             else:
                 for task in tasks:
                     minutes = time_str_to_minutes(task['time'])
-                    new_rows.append([date_str, category, item, task['task'], minutes])
+                    rows.append((category, item, task['task'], minutes))
+    return rows
+
+def rows_to_summary(rows, log_date, timeline=None):
+    """summary_to_rows 的逆过程：由 (category, item, task, minutes) 行（以及打点时间）重建单日摘要。"""
+    item_details = new_item_details()
+    for category, item, task, minutes in rows:
+        if task == "N/A":
+            # 没有任务明细的子项只记录总时长
+            item_details[category][item]['total_minutes'] += minutes
+        else:
+            add_item_tasks(item_details, category, item, [{'name': task, 'minutes': minutes}])
+    return build_summary(item_details, log_date, timeline)
 
-    # 将保留的旧数据和当天的新数据全部写回文件
-    with open(csv_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(header)
-        writer.writerows(rows_to_keep)
-        writer.writerows(new_rows)
+@timing.timed('写入历史')
+def append_to_csv(summary_data, log_date, db_file=history_store.DB_FILE):
+    """
+    将每日总结写入历史数据库。
+    此函数是幂等的：当天已有的记录会在同一个事务中被新数据替换，只涉及当天的记录。
+    第一次运行时会自动把旧的 historical_data.csv 迁移到数据库。
+    """
+    date_str = log_date.strftime('%Y-%m-%d')
+    history_store.upsert_day(date_str, summary_to_rows(summary_data), db_file, summary_data.get('timeline'))
+    print(f"数据已成功更新到 '{db_file}'。")
+
+@timing.timed('写入摘要JSON')
+def write_summary_json(summary_data, output_file):
+    """将单日摘要写入JSON文件。"""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(summary_data, f, ensure_ascii=False, indent=2)
+
+def process_all_days(log_file, output_file, summaries_dir):
+    """
+    逐日处理整个日志文件：每一天写出各自的摘要JSON并更新CSV，
+    最后一天的摘要同时写入 output_file，以兼容 build_report.py 的默认输入。
+    """
+    os.makedirs(summaries_dir, exist_ok=True)
+    last_summary = None
+    processed_days = 0
+
+    with open(log_file, 'r', encoding='utf-8') as f:
+        # 先只扫描一遍日期标题推算年份（跨年的日志需要参照后面的标题），再从头流式解析
+        with timing.stage('解析日志'):
+            dates = log_header_dates(f)
+        f.seek(0)
+        days = iter_log_days(f, dates)
+        while True:
+            # 日志是流式解析的，每取出一天计一次解析耗时
+            with timing.stage('解析日志'):
+                day = next(days, None)
+            if day is None:
+                break
+            summary_data, log_date = day
+            date_str = log_date.strftime('%Y-%m-%d')
+            if not summary_data['daily_details']:
+                # 只有日期标题、没有任何记录的日子不写入，避免清空已有的历史数据
+                print(f"跳过 {date_str}：没有找到任何时间记录。")
+                continue
+
+            day_file = os.path.join(summaries_dir, f'summary-{date_str}.json')
+            write_summary_json(summary_data, day_file)
+            append_to_csv(summary_data, log_date)
+            # Standardize the output for easy parsing by the GUI
+            print(f"--> {day_file}")
 
-    print(f"数据已成功更新到 '{csv_file}'。")
+            last_summary = summary_data
+            processed_days += 1
+
+    if last_summary is None:
+        print(f"错误：'{log_file}' 中没有找到任何有效的日期记录。")
+        return
+
+    write_summary_json(last_summary, output_file)
+    print(f"共处理 {processed_days} 天的日志，最后一天的摘要已写入 '{output_file}'。")
+
+def parse_args():
+    """解析命令行参数。"""
+    parser = argparse.ArgumentParser(description="解析 log.md，生成每日摘要并更新历史数据。")
+    parser.add_argument('--all', action='store_true',
+                        help="按 '## 月.日' 标题逐日处理整个日志，每一天分别生成摘要并更新CSV。")
+    parser.add_argument('--log', type=str, default='data/log.md', help="日志文件路径。")
+    parser.add_argument('--summaries-dir', type=str, default='data/summaries',
+                        help="--all 模式下每日摘要JSON的输出目录。")
+    timing.add_arguments(parser)
+    return parser.parse_args()
 
 def main():
     """主函数"""
+    args = parse_args()
+    with timing.profiling(args):
+        run(args)
+
+def run(args):
+    """按命令行参数处理日志。"""
     # 假设日志文件名为 log.md
-    log_file = 'data/log.md' 
+    log_file = args.log
     output_file = 'data/summary.json'
 
     # 检查日志文件是否存在
-    try:
-        with open(log_file, 'r', encoding='utf-8') as f:
-            log_content = f.read()
-        print(f"开始处理 '{log_file}'...")
-    except FileNotFoundError:
+    if not os.path.isfile(log_file):
         print(f"错误：日志文件 '{log_file}' 不存在。")
         print("请创建一个 'log.md' 文件并填入您的时间记录。")
         # 创建一个带有提示内容的log.md文件
@@ -215,12 +493,20 @@ def main():
         print(f"已为您创建一个示例 '{log_file}'。请填充内容后重新运行。")
         return
 
+    print(f"开始处理 '{log_file}'...")
+    if args.all:
+        process_all_days(log_file, output_file, args.summaries_dir)
+        return
+
+    with timing.stage('读取日志'), open(log_file, 'r', encoding='utf-8') as f:
+        log_content = f.read()
+
     # 解析日志并生成JSON
-    summary_data, log_date = parse_log_content(log_content)
+    with timing.stage('解析日志'):
+        summary_data, log_date = parse_log_content(log_content)
     
     # 将结果写入JSON文件
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(summary_data, f, ensure_ascii=False, indent=2)
+    write_summary_json(summary_data, output_file)
         
     print(f"成功生成 '{output_file}'！")
 
@@ -228,4 +514,4 @@ def main():
     append_to_csv(summary_data, log_date)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,149 @@
+import argparse
+import hashlib
+import json
+import os
+
+# 报告引用的共享文件都放在 reports/ 下，路径相对于报告本身
+REPORTS_DIR = 'reports'
+HISTORY_DATA_FILE = 'data/history.js'
+
+# 报告的历史数据模式：inline 把数据嵌入每份报告；shared 写入共享文件，所有报告引用同一份
+DATA_MODES = ['inline', 'shared']
+
+
+def write_if_changed(path, content):
+    """内容有变化时才写入（先写临时文件再重命名），避免不必要地刷新浏览器缓存。"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+def write_history_data(historical_data):
+    """
+    把历史趋势数据写入共享的 reports/data/history.js，返回报告中引用它的相对地址。
+    使用 .js 而不是 .json：直接双击打开的报告 (file://) 无法 fetch 本地文件，但可以加载脚本。
+    地址带有内容哈希，数据变化后浏览器会重新下载，否则直接使用缓存。
+    """
+    payload = json.dumps(historical_data, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    content = f"window.reportHistory = {payload};\n"
+    write_if_changed(os.path.join(REPORTS_DIR, HISTORY_DATA_FILE), content)
+    version = hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]
+    return f"{HISTORY_DATA_FILE}?v={version}"
+
+# --- ECharts ---
+
+# 报告使用的 ECharts 版本（固定版本，升级时只需修改这里）
+ECHARTS_VERSION = '5.4.3'
+ECHARTS_CDN_URL = f'https://cdn.jsdelivr.net/npm/echarts@{ECHARTS_VERSION}/dist/echarts.min.js'
+# 随仓库提交的 ECharts 副本（npm 包 echarts 的 dist/echarts.min.js），离线环境可以直接使用
+ECHARTS_VENDOR_FILE = f'vendor/echarts-{ECHARTS_VERSION}.min.js'
+# 该副本的 SHA-256；本地文件和重新下载的内容都必须与它一致，升级版本时一起修改。
+# 来源：nicegui 1.3.18、1.4.0 和 1.4.10 的 PyPI 发行包所带的 echarts.min.js（三者完全相同，文件头部为 ECharts 5.4.3）。
+# 提交时无法访问 npm 和 jsDelivr，尚未与官方文件直接比对：jsDelivr 页面给出的 SRI 应为
+# sha384-BQKzmHvQLMCAnL3UtDBA1Al5tFjsCz1wrMlIUA1wkzo14DYkRWjywW+p9pCj0cwd，也可以运行 --check-cdn 下载比对。
+ECHARTS_SHA256 = '1156429a16a38cb8604dcc6518c19406d4226142d908f8edd2e3531443c54d19'
+ASSETS_DIR = 'assets'
+
+# ECharts 的加载方式：cdn 从CDN加载；vendor 引用 reports/assets/ 下带内容哈希的本地副本；inline 嵌入报告
+ECHARTS_MODES = ['cdn', 'vendor', 'inline']
+
+
+def check_echarts(content, source):
+    """校验 ECharts 内容的 SHA-256，与固定的版本不一致时引发 RuntimeError。"""
+    digest = hashlib.sha256(content).hexdigest()
+    if digest != ECHARTS_SHA256:
+        raise RuntimeError(f"{source} 的 SHA-256 ({digest}) 与 ECharts {ECHARTS_VERSION} 的固定值 ({ECHARTS_SHA256}) 不一致。")
+
+def download_echarts():
+    """从CDN下载官方发布的 ECharts（npm 包的 dist/echarts.min.js），返回其内容。"""
+    from urllib.request import urlopen
+
+    print(f"正在下载 ECharts {ECHARTS_VERSION}: {ECHARTS_CDN_URL}")
+    with urlopen(ECHARTS_CDN_URL, timeout=60) as response:
+        return response.read()
+
+def check_cdn_echarts():
+    """下载官方文件，确认固定的 SHA-256 与它一致（随仓库提交的副本由 fetch_echarts 按同一个值校验）。"""
+    try:
+        content = download_echarts()
+    except OSError as e:
+        raise RuntimeError(f"无法下载 ECharts ({e})。")
+    check_echarts(content, ECHARTS_CDN_URL)
+    print(f"CDN 上的 ECharts {ECHARTS_VERSION} 与固定的 SHA-256 一致。")
+
+def fetch_echarts(vendor_file=ECHARTS_VENDOR_FILE):
+    """
+    确保本地有一份校验通过的 ECharts，返回其路径：已经存在时校验后直接返回，
+    否则（例如删除了仓库中的副本）从CDN下载一次，校验通过后才保存。
+    """
+    if os.path.exists(vendor_file):
+        with open(vendor_file, 'rb') as f:
+            check_echarts(f.read(), f"'{vendor_file}'")
+        return vendor_file
+    try:
+        content = download_echarts()
+    except OSError as e:
+        raise RuntimeError(f"无法下载 ECharts ({e})。离线环境请手动把 echarts.min.js ({ECHARTS_VERSION}) 放到 '{vendor_file}'。")
+    check_echarts(content, ECHARTS_CDN_URL)
+    os.makedirs(os.path.dirname(vendor_file), exist_ok=True)
+    with open(vendor_file + '.tmp', 'wb') as f:
+        f.write(content)
+    os.replace(vendor_file + '.tmp', vendor_file)
+    return vendor_file
+
+def vendor_echarts(vendor_file=ECHARTS_VENDOR_FILE):
+    """
+    把本地的 ECharts 副本复制到 reports/assets/echarts-<内容哈希>.min.js，返回报告中引用它的相对地址。
+    文件名随内容变化，浏览器可以一直缓存同一个文件。
+    """
+    with open(fetch_echarts(vendor_file), 'rb') as f:
+        content = f.read()
+    file_name = f"echarts-{hashlib.sha256(content).hexdigest()[:12]}.min.js"
+    asset_path = os.path.join(REPORTS_DIR, ASSETS_DIR, file_name)
+    if not os.path.exists(asset_path):
+        os.makedirs(os.path.dirname(asset_path), exist_ok=True)
+        with open(asset_path + '.tmp', 'wb') as f:
+            f.write(content)
+        os.replace(asset_path + '.tmp', asset_path)
+    return f"{ASSETS_DIR}/{file_name}"
+
+def echarts_context(mode='cdn', vendor_file=ECHARTS_VENDOR_FILE):
+    """模板中加载 ECharts 所需的变量：echarts_src（脚本地址）或 echarts_inline（嵌入的脚本内容）。"""
+    if mode == 'vendor':
+        return {"echarts_src": vendor_echarts(vendor_file), "echarts_inline": None}
+    if mode == 'inline':
+        with open(fetch_echarts(vendor_file), 'r', encoding='utf-8') as f:
+            # 避免脚本内容中的 </script 提前结束 <script> 标签
+            code = f.read().replace('</script', '<\\/script')
+        return {"echarts_src": None, "echarts_inline": code}
+    return {"echarts_src": ECHARTS_CDN_URL, "echarts_inline": None}
+
+def main():
+    """命令行入口：预先下载 ECharts，供离线生成报告使用。"""
+    parser = argparse.ArgumentParser(description="管理报告引用的静态资源。")
+    parser.add_argument('--fetch-echarts', action='store_true',
+                        help=f"下载 ECharts {ECHARTS_VERSION} 到 '{ECHARTS_VENDOR_FILE}'（已存在时只做校验）。")
+    parser.add_argument('--check-cdn', action='store_true',
+                        help=f"从 CDN 下载官方的 ECharts {ECHARTS_VERSION}，核对固定的 SHA-256。")
+    args = parser.parse_args()
+
+    if not (args.fetch_echarts or args.check_cdn):
+        parser.print_help()
+        return
+    try:
+        if args.check_cdn:
+            check_cdn_echarts()
+        if args.fetch_echarts:
+            print(f"--> {fetch_echarts()}")
+    except RuntimeError as e:
+        print(f"错误: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import datetime
+
+# --- Predefined color list for categories ---
+CATEGORY_COLORS = {
+    '第一类': '#3498db',  # 蓝色
+    '第二类': '#2ecc71',  # 绿色
+    '根源': '#9b59b6',   # 紫色
+    '娱乐': '#f1c40f',   # 黄色
+    '杂项': '#e74c3c',    # 红色
+    'default': '#7f8c8d'  # 灰色
+}
+COLOR_LIST = ['#5470C6', '#91CC75', '#FAC858', '#EE6666', '#73C0DE', '#3BA272', '#FC8452', '#9A60B4', '#EA7CCC']
+
+DURATION_COLUMN = 'Task Duration (minutes)'
+
+
+def time_str_to_minutes(time_str):
+    """将'Xh Ym'或'Xh'或'Ym'格式的字符串转换为分钟。"""
+    hours = 0
+    minutes = 0
+    if not isinstance(time_str, str):
+        return 0
+    time_str = time_str.strip()
+    
+    if 'h' in time_str:
+        parts = time_str.split('h')
+        try:
+            hours = int(parts[0])
+        except ValueError:
+            hours = 0
+        if parts[1] and 'm' in parts[1]:
+            try:
+                minutes = int(parts[1].replace('m', ''))
+            except (ValueError, IndexError):
+                minutes = 0
+    elif 'm' in time_str:
+        try:
+            minutes = int(time_str.replace('m', ''))
+        except ValueError:
+            minutes = 0
+            
+    return hours * 60 + minutes
+
+def minutes_to_time_str(minutes):
+    """将分钟数转换为'Xh Ym'格式的字符串。"""
+    if minutes is None or minutes < 0:
+        return "0m"
+    if minutes == 0:
+        return "0m"
+    hours = minutes // 60
+    mins = minutes % 60
+    result = ''
+    if hours > 0:
+        result += f"{hours}h"
+    if mins > 0:
+        result += ('' if result == '' else ' ') + f"{mins}m"
+    return result
+
+def category_color(category, index=None):
+    """类别的颜色：预定义颜色优先；否则按序号从 COLOR_LIST 取色，未给序号时用默认灰色。"""
+    if category in CATEGORY_COLORS:
+        return CATEGORY_COLORS[category]
+    if index is None:
+        return CATEGORY_COLORS['default']
+    return COLOR_LIST[index % len(COLOR_LIST)]
+
+def build_hierarchy(df, sort_keys=True, category_sort_key=None, sort_children_by_value=True, use_color_list=True):
+    """
+    从包含 Category/Item/Task/时长 列的DataFrame一次性计算 类别→子项→任务 三层汇总，
+    直接生成旭日图/卡片所需的 chart_data 和饼图所需的 pie_data。
+
+    - sort_keys: True 时按名称排序分组，False 时保留首次出现的顺序；
+    - category_sort_key: 对类别再排序的 key 函数（稳定排序）；
+    - sort_children_by_value: 子项和任务是否按时长从大到小排序；
+    - use_color_list: 未预定义颜色的类别是否按序号从 COLOR_LIST 取色，否则用默认灰色。
+    """
+    if df.empty:
+        return [], []
+
+    # 三层汇总都由同一次分组结果逐级相加得到
+    task_totals = df.groupby(['Category', 'Item', 'Task'], observed=True, sort=sort_keys)[DURATION_COLUMN].sum()
+    item_totals = task_totals.groupby(level=[0, 1], observed=True, sort=sort_keys).sum()
+    category_totals = task_totals.groupby(level=0, observed=True, sort=sort_keys).sum()
+
+    tasks_by_item = {}
+    for (category, item, task), duration in zip(task_totals.index.tolist(), task_totals.tolist()):
+        tasks_by_item.setdefault((category, item), []).append({
+            "name": task,
+            "value": int(duration),
+            "time_str": minutes_to_time_str(int(duration))
+        })
+
+    items_by_category = {}
+    for (category, item), duration in zip(item_totals.index.tolist(), item_totals.tolist()):
+        tasks_children = tasks_by_item[(category, item)]
+        if sort_children_by_value:
+            tasks_children = sorted(tasks_children, key=lambda x: x['value'], reverse=True)
+        items_by_category.setdefault(category, []).append({
+            "name": item,
+            "value": int(duration),
+            "value_str": minutes_to_time_str(int(duration)),
+            "children": tasks_children
+        })
+
+    categories = category_totals.index.tolist()
+    if category_sort_key is not None:
+        categories = sorted(categories, key=category_sort_key)
+
+    chart_data = []
+    pie_data = []
+    for index, category in enumerate(categories):
+        category_total_minutes = int(category_totals[category])
+        color = category_color(category, index if use_color_list else None)
+        children = items_by_category[category]
+        if sort_children_by_value:
+            children = sorted(children, key=lambda x: x['value'], reverse=True)
+
+        chart_data.append({
+            "name": category,
+            "value": category_total_minutes,
+            "value_str": minutes_to_time_str(category_total_minutes),
+            "itemStyle": {"color": color},
+            "children": children
+        })
+        pie_data.append({
+            "name": category,
+            "value": category_total_minutes,
+            "itemStyle": {"color": color}
+        })
+
+    return chart_data, pie_data
+
+def history_columns(df, bucket='day'):
+    """
+    把 Date/Category/时长 记录按日期汇总为列式的历史趋势数据：
+    {"dates": [日期...], "categories": [类别...], "values": [[每个日期的分钟数...] (与 categories 一一对应)], "bucket": 粒度}。
+    所有历史图表共用这一份数据，报告中只嵌入一次。bucket 为 'month' 时日期显示为 'YYYY-MM'。
+    """
+    pivot_df = df.pivot_table(index='Date', columns='Category', values=DURATION_COLUMN, aggfunc='sum', observed=True).fillna(0)
+    return {
+        "dates": pivot_df.index.strftime('%Y-%m' if bucket == 'month' else '%Y-%m-%d').tolist(),
+        "categories": pivot_df.columns.tolist(),
+        "values": pivot_df.to_numpy(dtype='int64').T.tolist(),
+        "bucket": bucket
+    }
+
+def lttb_indices(values, threshold):
+    """
+    Largest-Triangle-Three-Buckets 降采样：从 values 中选出 threshold 个点的下标，
+    保留首尾两点，其余每个桶中选与相邻桶构成三角形面积最大的点，尽量保留曲线的形状。
+    """
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    every = (n - 2) / (threshold - 2)
+    indices = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # 下一个桶的平均点
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = (avg_start + avg_end - 1) / 2
+        avg_y = sum(values[avg_start:avg_end]) / (avg_end - avg_start)
+
+        # 当前桶中与上一个选中点、下一个桶平均点构成最大三角形的点
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        best_index, best_area = range_start, -1
+        for j in range(range_start, range_end):
+            area = abs((a - avg_x) * (values[j] - values[a]) - (a - j) * (avg_y - values[a]))
+            if area > best_area:
+                best_index, best_area = j, area
+        indices.append(best_index)
+        a = best_index
+    indices.append(n - 1)
+    return indices
+
+def downsample_columns(columns, threshold):
+    """按各类别之和的曲线做 LTTB 降采样，所有类别保留相同的日期，使堆叠图仍然对齐。"""
+    dates = columns["dates"]
+    if not threshold or threshold >= len(dates):
+        return columns
+    totals = [sum(day_values) for day_values in zip(*columns["values"])]
+    indices = lttb_indices(totals, threshold)
+    return dict(
+        columns,
+        dates=[dates[i] for i in indices],
+        values=[[series[i] for i in indices] for series in columns["values"]],
+        sampled_from=len(dates)
+    )
+
+def hour_heatmap(timelines):
+    """
+    由每天的打点时间（分钟偏移数组）统计作息热力图：相邻两个时间构成一段记录，
+    按 星期×小时 累加记录覆盖的分钟数，再除以该星期几有打点记录的天数。
+    返回 {"values": [[小时, 星期(0=周一), 平均分钟数], ...], "days": 天数}；没有任何记录时返回 None。
+    """
+    totals = [[0] * 24 for _ in range(7)]
+    day_counts = [0] * 7
+    for date_str, minutes in timelines:
+        if len(minutes) < 2:
+            continue
+        weekday = datetime.date.fromisoformat(date_str).weekday()
+        day_counts[weekday] += 1
+        hours = totals[weekday]
+        for start, end in zip(minutes, minutes[1:]):
+            # 跨越整点的一段拆到各个小时；过了午夜的部分仍计入当天的星期
+            while start < end:
+                segment_end = min(end, (start // 60 + 1) * 60)
+                hours[(start // 60) % 24] += segment_end - start
+                start = segment_end
+    if not any(day_counts):
+        return None
+    return {
+        "values": [[hour, weekday, round(totals[weekday][hour] / day_counts[weekday], 1)]
+                   for weekday in range(7) if day_counts[weekday] for hour in range(24)],
+        "days": sum(day_counts)
+    }
+
+def calendar_data(rows):
+    """
+    由 日×类别 汇总行 (date, category, minutes) 一次遍历生成年度日历热力图的数据，按年、按类别紧凑存放：
+    {"categories": [类别...], "years": [{"year": 年, "values": [[当年第1天起每天的分钟数...] (与 categories 一一对应)]}, ...]}。
+    每年的数组从1月1日开始，末尾没有记录的日子被省略；没有任何记录时返回 None。
+    """
+    categories = {}
+    years = {}
+    for date_str, category, minutes in rows:
+        date = datetime.date.fromisoformat(date_str)
+        index = categories.setdefault(category, len(categories))
+        columns = years.setdefault(date.year, [])
+        while len(columns) <= index:
+            columns.append([])
+        column = columns[index]
+        day = date.timetuple().tm_yday - 1
+        if len(column) <= day:
+            column.extend([0] * (day + 1 - len(column)))
+        column[day] += minutes
+    if not categories:
+        return None
+    return {
+        "categories": list(categories),
+        "years": [{"year": year, "values": columns + [[] for _ in range(len(categories) - len(columns))]}
+                  for year, columns in sorted(years.items())]
+    }
+
+def summary_to_dataframe(data):
+    """把单日摘要 (summary.json 格式) 展开为 Category/Item/Task/时长 的DataFrame。"""
+    import pandas as pd
+
+    rows = []
+    for category, items in data.get("daily_details", {}).items():
+        for item, tasks in items.items():
+            for task in tasks:
+                rows.append((category, item, task['task'], time_str_to_minutes(task['time'])))
+    return pd.DataFrame(rows, columns=['Category', 'Item', 'Task', DURATION_COLUMN])
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+
+import templating
+
+# 记录每份每日报告是由哪些输入生成的，输入不变时跳过重新渲染
+MANIFEST_FILE = 'data/report_manifest.json'
+
+# 参与渲染每日报告的脚本（包括 tojson 的转义方式、ECharts 和历史数据的引用方式）；它们的内容变化时所有报告都需要重新生成
+RENDER_SOURCES = ['build_report.py', 'report_data.py', 'templating.py', 'report_assets.py']
+
+# 模板和脚本在一个进程内只计算一次哈希
+_inputs_digest = None
+
+
+def file_digest(path):
+    """文件内容的 SHA-256。"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def summary_digest(summary_data):
+    """单日摘要的哈希。不排序键：类别、子项的顺序会影响报告内容。"""
+    payload = json.dumps(summary_data, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def inputs_digest():
+    """模板文件和渲染脚本的组合哈希。"""
+    global _inputs_digest
+    if _inputs_digest is None:
+        scripts_dir = os.path.dirname(os.path.realpath(__file__))
+        paths = [os.path.join(templating.TEMPLATE_DIR, templating.REPORT_TEMPLATE)]
+        paths += [os.path.join(scripts_dir, name) for name in RENDER_SOURCES]
+        sha = hashlib.sha256()
+        for path in paths:
+            sha.update(file_digest(path).encode('ascii'))
+        _inputs_digest = sha.hexdigest()
+    return _inputs_digest
+
+def load_manifest(manifest_file=MANIFEST_FILE):
+    """读取清单：{ 日期: {"summary": 摘要哈希, "inputs": 模板/脚本哈希, "output": 报告路径} }。"""
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest, manifest_file=MANIFEST_FILE):
+    """写入清单（先写临时文件再重命名）。"""
+    tmp_file = manifest_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_file, manifest_file)
+
+def record(manifest, summary_data, output_file, options=None):
+    """在清单中记录一份刚生成的报告；options 为生成时的输出选项（历史数据模式、ECharts 加载方式等）。"""
+    manifest[summary_data['report_date']] = {
+        "summary": summary_digest(summary_data),
+        "inputs": inputs_digest(),
+        "options": options or {},
+        "output": output_file
+    }
+
+def stale_reason(manifest, summary_data, output_file, options=None):
+    """报告需要重新生成的原因；报告仍是最新的时返回 None。options 为 None 时不比较输出选项。"""
+    entry = manifest.get(summary_data.get('report_date'))
+    if not os.path.exists(output_file):
+        return "报告不存在"
+    if entry is None:
+        return "没有生成记录"
+    if entry.get('summary') != summary_digest(summary_data):
+        return "当天数据已变化"
+    if entry.get('inputs') != inputs_digest():
+        return "模板或脚本已变化"
+    if options is not None and entry.get('options', {}) != options:
+        return "输出选项已变化"
+    return None
@@ -0,0 +1,38 @@
+import report_assets
+
+# 影响报告内容的输出选项；会记录在报告清单中，任何一项变化都会触发重新生成
+TREND_BUCKETS = ['auto', 'day', 'week', 'month']
+DEFAULT_OPTIONS = {
+    "data_mode": 'inline',      # 历史数据：inline 嵌入报告 / shared 写入共享文件
+    "echarts_mode": 'cdn',      # ECharts：cdn / vendor / inline
+    "trend_bucket": 'auto',     # 趋势图粒度：auto / day / week / month
+    "trend_points": None,       # 趋势图 LTTB 降采样的目标点数，None 表示不降采样
+    "live_reload": False        # 页面轮询 live-reload.json 并在报告更新后自动刷新（仅 --watch 模式使用）
+}
+
+
+def make_options(options=None):
+    """补全输出选项：未给出的项使用默认值。"""
+    merged = dict(DEFAULT_OPTIONS)
+    merged.update(options or {})
+    return merged
+
+def add_arguments(parser):
+    """为命令行添加输出选项参数。"""
+    parser.add_argument('--data-mode', choices=report_assets.DATA_MODES, default=DEFAULT_OPTIONS['data_mode'],
+                        help="历史数据的输出方式：inline 嵌入报告；shared 写入共享的 reports/data/history.js。")
+    parser.add_argument('--echarts', choices=report_assets.ECHARTS_MODES, default=DEFAULT_OPTIONS['echarts_mode'],
+                        help="ECharts 的加载方式：cdn；vendor 引用 reports/assets/ 下的本地副本；inline 嵌入报告。")
+    parser.add_argument('--trend-bucket', choices=TREND_BUCKETS, default=DEFAULT_OPTIONS['trend_bucket'],
+                        help="趋势图的时间粒度；auto 在历史超过一年时按周、超过三年时按月汇总。")
+    parser.add_argument('--trend-points', type=int, default=DEFAULT_OPTIONS['trend_points'],
+                        help="（可选）用 LTTB 算法把趋势图降采样到指定的点数。")
+
+def from_args(args):
+    """从命令行参数中取出输出选项。"""
+    return make_options({
+        "data_mode": args.data_mode,
+        "echarts_mode": args.echarts,
+        "trend_bucket": args.trend_bucket,
+        "trend_points": args.trend_points
+    })
@@ -0,0 +1,318 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import report_options
+
+# 常驻进程的地址和认证密钥，供客户端（GUI、批处理脚本）查找
+STATE_FILE = 'data/.report_worker.json'
+DEFAULT_IDLE_TIMEOUT = 1800
+# 连接常驻进程并完成认证的最长等待时间（秒）
+CONNECT_TIMEOUT = 2
+
+
+def get_project_root():
+    """项目根目录（scripts 的上一级）。"""
+    return os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
+
+def state_file_path():
+    """状态文件的绝对路径。"""
+    return os.path.join(get_project_root(), STATE_FILE)
+
+def read_state():
+    """读取常驻进程的状态（地址、密钥、pid），不存在时返回 None。"""
+    try:
+        with open(state_file_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def write_state(state):
+    """写入状态文件（仅当前用户可读）。"""
+    path = state_file_path()
+    tmp_path = path + '.tmp'
+    with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def remove_state(pid=None):
+    """删除状态文件；指定 pid 时只删除属于该进程的状态。"""
+    state = read_state()
+    if state is None or (pid is not None and state.get('pid') != pid):
+        return
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(state_file_path())
+
+# --- 常驻进程 ---
+
+def warm_up():
+    """预先导入 pandas/Jinja、编译模板并把历史数据读入内存。"""
+    import pipeline  # noqa: F401  导入 pandas、jinja2 以及全部报告模块
+    import history_cache
+    import templating
+
+    templating.get_report_template()
+    history_cache.load_history()
+
+def handle_job(job):
+    """执行一个任务，返回结果字典；任务执行期间的输出会一并返回。"""
+    import pipeline
+
+    command = job.get('cmd')
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            if command == 'daily':
+                reports = pipeline.render_daily(job['log_text'], job.get('force', False), job.get('options'))
+            elif command == 'period':
+                report = pipeline.render_period(job.get('start'), job.get('end'), job.get('period'), job.get('output'),
+                                                job.get('options'))
+                reports = [report] if report else []
+            else:
+                return {'ok': False, 'error': f"未知的任务类型: {command}"}
+    except Exception as e:
+        traceback.print_exc(file=output)
+        return {'ok': False, 'error': str(e), 'output': output.getvalue()}
+    return {'ok': True, 'reports': reports, 'output': output.getvalue()}
+
+def serve(idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """
+    启动常驻进程，直到收到 stop 或空闲超时。每个连接在单独的线程中处理，ping 总能立即得到回应；
+    报告任务共用预热的模板、缓存和工作目录，依次执行。
+    """
+    os.chdir(get_project_root())
+    warm_up()
+
+    authkey = secrets.token_bytes(32)
+    listener = Listener(('127.0.0.1', 0), authkey=authkey)
+    host, port = listener.address
+    pid = os.getpid()
+    write_state({'host': host, 'port': port, 'authkey': authkey.hex(), 'pid': pid})
+    print(f"报告常驻进程已启动: {host}:{port} (pid {pid})")
+
+    job_lock = threading.Lock()
+    stopping = threading.Event()
+    last_activity = [time.monotonic()]
+
+    def idle():
+        return time.monotonic() - last_activity[0] > idle_timeout
+
+    if idle_timeout:
+        def watch_idle():
+            while True:
+                time.sleep(min(idle_timeout, 30))
+                # 正在执行任务时 job_lock 被占用，不能退出；拿到锁后再确认一次，期间收到的任务会更新 last_activity
+                if idle() and job_lock.acquire(blocking=False):
+                    if idle():
+                        remove_state(pid)
+                        os._exit(0)
+                    job_lock.release()
+        threading.Thread(target=watch_idle, daemon=True).start()
+
+    def handle_connection(conn):
+        with conn:
+            try:
+                job = conn.recv()
+            except (EOFError, OSError):
+                return
+            last_activity[0] = time.monotonic()
+            command = job.get('cmd')
+            if command == 'ping':
+                conn.send({'ok': True, 'pid': pid})
+                return
+            if command == 'stop':
+                conn.send({'ok': True})
+            # stop 立即回应，但要等正在执行的任务完成后再退出
+            with job_lock:
+                if command == 'stop':
+                    stopping.set()
+                    # 连接一次自己，唤醒阻塞在 accept() 上的主线程
+                    with contextlib.suppress(OSError):
+                        socket.create_connection((host, port), timeout=CONNECT_TIMEOUT).close()
+                else:
+                    conn.send(handle_job(job))
+                last_activity[0] = time.monotonic()
+
+    try:
+        while not stopping.is_set():
+            try:
+                conn = listener.accept()
+            except Exception:
+                # 认证失败等连接错误不影响后续任务
+                continue
+            threading.Thread(target=handle_connection, args=(conn,), daemon=True).start()
+    finally:
+        listener.close()
+        remove_state(pid)
+
+# --- 客户端 ---
+
+def connect(state, timeout=CONNECT_TIMEOUT):
+    """
+    连接状态文件中的常驻进程并完成认证，失败或 timeout 秒内没有完成时返回 None。
+    Client() 的连接和认证握手没有超时（状态文件过期、端口被其它程序占用时可能永远等下去），
+    所以放在后台线程中进行；超时后才建立的连接会被直接关闭。
+    """
+    result = {}
+    lock = threading.Lock()
+
+    def attempt():
+        try:
+            conn = Client((state['host'], state['port']), authkey=bytes.fromhex(state['authkey']))
+        except (OSError, EOFError, ValueError, KeyError, AuthenticationError):
+            return
+        with lock:
+            if result.get('abandoned'):
+                conn.close()
+            else:
+                result['conn'] = conn
+
+    thread = threading.Thread(target=attempt, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    with lock:
+        result['abandoned'] = True
+        return result.get('conn')
+
+def send_job(job, timeout=None):
+    """
+    把任务发给正在运行的常驻进程并等待结果。
+    没有可用的常驻进程时返回 None（调用方可以改为在当前进程内执行）。
+    """
+    state = read_state()
+    if state is None:
+        return None
+    conn = connect(state)
+    if conn is None:
+        # 常驻进程已经退出（或端口已被其它程序占用），清理过期的状态文件
+        remove_state(state.get('pid'))
+        return None
+    with conn:
+        try:
+            conn.send(job)
+            if timeout is not None and not conn.poll(timeout):
+                return None
+            return conn.recv()
+        except (EOFError, OSError):
+            # 常驻进程在处理前退出（例如恰好空闲超时）或连接中断，同样视为没有可用的常驻进程
+            return None
+
+def is_running():
+    """常驻进程是否可用。"""
+    result = send_job({'cmd': 'ping'}, timeout=5)
+    return bool(result and result.get('ok'))
+
+def start_worker(idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """在后台启动常驻进程（不等待其完成预热），返回 Popen 对象。"""
+    command = [sys.executable, os.path.realpath(__file__), 'serve', '--idle-timeout', str(idle_timeout)]
+    kwargs = {'cwd': get_project_root(), 'stdin': subprocess.DEVNULL,
+              'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+    if os.name == 'nt':
+        kwargs['creationflags'] = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+    else:
+        kwargs['start_new_session'] = True
+    return subprocess.Popen(command, **kwargs)
+
+def wait_until_ready(timeout=30):
+    """等待常驻进程完成预热并可以接受任务。"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if is_running():
+            return True
+        time.sleep(0.2)
+    return False
+
+def stop_worker():
+    """请求常驻进程退出。"""
+    return send_job({'cmd': 'stop'}, timeout=5) is not None
+
+def run_job(job):
+    """优先交给常驻进程执行；常驻进程不可用时在当前进程内执行。"""
+    result = send_job(job)
+    if result is None:
+        os.chdir(get_project_root())
+        result = handle_job(job)
+    return result
+
+def main():
+    """命令行入口：启动/停止常驻进程，或通过它生成报告。"""
+    parser = argparse.ArgumentParser(description="报告常驻进程：预热 pandas、模板和历史数据，复用它们生成报告。")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help="在前台运行常驻进程。")
+    serve_parser.add_argument('--idle-timeout', type=int, default=DEFAULT_IDLE_TIMEOUT,
+                              help="空闲多少秒后自动退出，0 表示不退出。")
+    start_parser = subparsers.add_parser('start', help="在后台启动常驻进程。")
+    start_parser.add_argument('--idle-timeout', type=int, default=DEFAULT_IDLE_TIMEOUT,
+                              help="空闲多少秒后自动退出，0 表示不退出。")
+    subparsers.add_parser('stop', help="停止常驻进程。")
+    subparsers.add_parser('status', help="查看常驻进程是否在运行。")
+
+    daily_parser = subparsers.add_parser('daily', help="解析日志并逐日生成每日报告。")
+    daily_parser.add_argument('--log', type=str, default='data/log.md', help="日志文件路径。")
+    daily_parser.add_argument('--force', action='store_true', help="即使内容没有变化也重新生成报告。")
+
+    period_parser = subparsers.add_parser('period', help="生成周期报告。")
+    period_parser.add_argument('--period', type=str, choices=['week', 'month', 'last7days'], help="预设的报告周期。")
+    period_parser.add_argument('--start', type=str, help="报告周期的开始日期 (YYYY-MM-DD)。")
+    period_parser.add_argument('--end', type=str, help="报告周期的结束日期 (YYYY-MM-DD)。")
+    period_parser.add_argument('--output', type=str, help="（可选）指定输出的HTML文件名。")
+    for subparser in (daily_parser, period_parser):
+        report_options.add_arguments(subparser)
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.idle_timeout)
+        return
+    if args.command == 'start':
+        if is_running():
+            print("常驻进程已经在运行。")
+            return
+        start_worker(args.idle_timeout)
+        print("常驻进程已启动。" if wait_until_ready() else "常驻进程启动超时。")
+        return
+    if args.command == 'stop':
+        print("常驻进程已停止。" if stop_worker() else "常驻进程没有在运行。")
+        return
+    if args.command == 'status':
+        state = read_state()
+        print(f"常驻进程正在运行 (pid {state['pid']})。" if is_running() else "常驻进程没有在运行。")
+        return
+
+    if args.command == 'daily':
+        log_file = os.path.join(get_project_root(), args.log)
+        try:
+            with open(log_file, 'r', encoding='utf-8') as f:
+                job = {'cmd': 'daily', 'log_text': f.read(), 'force': args.force,
+                       'options': report_options.from_args(args)}
+        except FileNotFoundError:
+            print(f"错误：日志文件 '{args.log}' 不存在。")
+            return
+    else:
+        job = {'cmd': 'period', 'period': args.period, 'start': args.start, 'end': args.end, 'output': args.output,
+               'options': report_options.from_args(args)}
+
+    result = run_job(job)
+    if result.get('output'):
+        print(result['output'], end='')
+    if not result.get('ok'):
+        print(f"错误: {result.get('error')}")
+        return
+    for report_file in result['reports']:
+        # Standardize the output for easy parsing by the GUI
+        print(f"--> {report_file}")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
-import subprocess
-import webbrowser
 import os
 import sys
-import re
-import locale
-from tkcalendar import DateEntry
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 
+import process_log
+import report_worker
+
 def get_script_path():
     """获取脚本所在目录的绝对路径"""
     if getattr(sys, 'frozen', False):
@@ -16,43 +18,126 @@ def get_script_path():
     else:
         return os.path.dirname(os.path.realpath(sys.argv[0]))
 
+def get_project_root():
+    """获取项目根目录（scripts 的上一级）。"""
+    return os.path.abspath(os.path.join(get_script_path(), os.pardir))
+
 def open_file_in_browser(file_path):
     """在浏览器中打开指定的文件"""
     if file_path and os.path.exists(file_path):
+        import webbrowser
+
         webbrowser.open(f"file://{os.path.abspath(file_path)}")
         return True
     return False
 
-def run_script(command, status_label):
-    """通用函数，用于运行脚本并捕获输出。"""
-    scripts_path = get_script_path()
-    project_root = os.path.abspath(os.path.join(scripts_path, os.pardir))
-    python_executable = sys.executable
-    
-    command = [python_executable] + command
-    
+def ensure_report_worker():
+    """确保报告常驻进程在运行：GUI启动时调用一次，由它保持 pandas、模板和历史数据的预热状态。"""
+    global worker_process
+    if not report_worker.is_running():
+        worker_process = report_worker.start_worker()
+
+def submit_report_job(job):
+    """
+    把报告任务交给常驻进程；常驻进程仍在预热时等待它就绪，不可用时在当前进程内执行。
+    结果中的 'elapsed' 为从提交到完成的总耗时（秒）。
+    """
+    start = time.perf_counter()
+    if worker_process is not None and worker_process.poll() is None:
+        report_worker.wait_until_ready()
+    result = report_worker.run_job(job)
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+def format_elapsed(results):
+    """状态栏中显示的耗时，例如 '（耗时 0.42 秒）'；多份报告时同时显示平均每份的耗时。"""
+    elapsed = [result.get('elapsed', 0) for result in results]
+    if len(elapsed) == 1:
+        return f"（耗时 {elapsed[0]:.2f} 秒）"
+    return f"（共耗时 {sum(elapsed):.2f} 秒，平均每份 {sum(elapsed) / len(elapsed):.2f} 秒）"
+
+def on_close():
+    """关闭窗口时取消未完成的任务，并停止由本程序启动的常驻进程。"""
+    cancel_event.set()
+    executor.shutdown(wait=False)
+    if worker_process is not None:
+        # 连接常驻进程最多需要等待 CONNECT_TIMEOUT 秒，在后台线程中发送停止请求，窗口立即关闭
+        threading.Thread(target=report_worker.stop_worker).start()
+    window.destroy()
+
+# --- 后台任务 ---
+# 报告在后台线程中生成，进度通过队列传回，由主线程用 window.after 轮询并更新界面
+
+def set_busy(busy):
+    """切换生成按钮和取消按钮的可用状态。"""
+    state = tk.DISABLED if busy else tk.NORMAL
+    generate_daily_button.config(state=state)
+    if generate_periodic_button is not None:
+        generate_periodic_button.config(state=state)
+    cancel_button.config(state=tk.NORMAL if busy else tk.DISABLED)
+
+def start_background_job(job_function, *args):
+    """在后台线程中运行 job_function，并开始轮询进度队列。"""
+    cancel_event.clear()
+    set_busy(True)
+    executor.submit(job_function, *args)
+    window.after(POLL_INTERVAL_MS, poll_progress)
+
+def cancel_generation():
+    """请求取消：当前这一天的报告完成后停止。"""
+    cancel_event.set()
+    cancel_button.config(state=tk.DISABLED)
+    status_label.config(text="正在取消，当前报告完成后停止...", fg="orange")
+
+def daily_job(chunks):
+    """后台线程：逐日提交报告任务，每完成一天就把结果放进队列。"""
     try:
-        status_label.config(text="处理中，请稍候...", fg="blue")
-        window.update_idletasks()
-
-        result = subprocess.run(
-            command, capture_output=True, text=True, encoding=locale.getpreferredencoding(False), check=False, cwd=project_root
-        )
-        
-        if result.returncode != 0:
-            error_message = f"脚本执行失败: {' '.join(command)}\n\n错误信息:\n{result.stderr or result.stdout}"
-            raise subprocess.CalledProcessError(result.returncode, command, stderr=error_message)
-            
-        return result.stdout
+        results = []
+        total = len(chunks)
+        for i, chunk in enumerate(chunks):
+            if cancel_event.is_set():
+                progress_queue.put(('daily_done', results, True))
+                return
+            last = f"（上一份耗时 {results[-1]['elapsed']:.2f} 秒）" if results else ""
+            progress_queue.put(('progress', f"正在生成第 {i+1}/{total} 份报告...{last}"))
+            results.append(submit_report_job({'cmd': 'daily', 'log_text': chunk}))
+        progress_queue.put(('daily_done', results, False))
+    except Exception as e:
+        progress_queue.put(('error', str(e)))
 
-    except subprocess.CalledProcessError as e:
-        messagebox.showerror("执行错误", e.stderr)
-        status_label.config(text="脚本执行失败，请查看错误弹窗。", fg="red")
-        return None
+def periodic_job(job):
+    """后台线程：提交周期报告任务。"""
+    try:
+        progress_queue.put(('periodic_done', submit_report_job(job)))
     except Exception as e:
-        messagebox.showerror("未知错误", f"发生未知错误: {e}")
-        status_label.config(text="发生未知错误，请查看错误弹窗。", fg="red")
-        return None
+        progress_queue.put(('error', str(e)))
+
+def poll_progress():
+    """主线程：处理后台线程发来的消息，任务未结束时继续轮询。"""
+    finished = False
+    try:
+        while True:
+            message = progress_queue.get_nowait()
+            kind = message[0]
+            if kind == 'progress':
+                status_label.config(text=message[1], fg="blue")
+            elif kind == 'daily_done':
+                finished = True
+                set_busy(False)
+                finish_daily_reports(message[1], message[2])
+            elif kind == 'periodic_done':
+                finished = True
+                set_busy(False)
+                finish_periodic_report(message[1])
+            elif kind == 'error':
+                finished = True
+                set_busy(False)
+                messagebox.showerror("未知错误", f"发生未知错误: {message[1]}")
+                status_label.config(text="发生未知错误，请查看错误弹窗。", fg="red")
+    except queue.Empty:
+        pass
+    if not finished:
+        window.after(POLL_INTERVAL_MS, poll_progress)
 
 def generate_daily_report():
     """处理并生成每日报告，支持一次性处理多个日期。"""
@@ -62,67 +147,34 @@ def generate_daily_report():
         status_label.config(text="请输入日志内容。", fg="red")
         return
 
-    scripts_path = get_script_path()
-    project_root = os.path.abspath(os.path.join(scripts_path, os.pardir))
-    log_file_path = os.path.join(project_root, 'data', 'log.md')
-
-    # 使用正则表达式按日期分割日志内容
-    # (^\s*##\s*\d{1,2}\.\d{1,2}\s*$)
-    # - ^: 匹配行首
-    # - \s*: 零或多个空白字符
-    # - ##: 字面量 "##"
-    # - \s*: 零或多个空白字符
-    # - \d{1,2}\.\d{1,2}: 月和日
-    # - \s*: 零或多个空白字符
-    # - $: 匹配行尾
-    # 括号将分隔符本身也包含在结果中
-    log_chunks_raw = re.split(r'(^\s*##\s*\d{1,2}\.\d{1,2}\s*$)', log_content, flags=re.MULTILINE)
-    
-    log_chunks = []
-    # 从1开始循环，因为第一个元素通常是空的（如果文本以日期开头）
-    for i in range(1, len(log_chunks_raw), 2):
-        # 将日期和其后的内容合并成一个块
-        date_header = log_chunks_raw[i]
-        content = log_chunks_raw[i+1] if (i+1) < len(log_chunks_raw) else ""
-        if date_header.strip() and content.strip():
-            log_chunks.append(date_header + content)
-
-    if not log_chunks:
-        # 如果没有找到任何日期标记，则将整个内容视为一个单独的报告
-        if log_content.strip():
-            log_chunks.append(log_content)
-        else:
-            messagebox.showerror("错误", "未找到有效的日志内容或日期标记 (## 月.日)。")
-            return
+    log_file_path = os.path.join(get_project_root(), 'data', 'log.md')
 
-    generated_reports = []
-    total_chunks = len(log_chunks)
+    # 保存一份日志，方便下次启动时加载
+    with open(log_file_path, "w", encoding="utf-8") as f:
+        f.write(log_content)
 
-    for i, chunk in enumerate(log_chunks):
-        status_label.config(text=f"正在处理第 {i+1}/{total_chunks} 份报告...", fg="blue")
-        window.update_idletasks() # 强制更新UI
-
-        with open(log_file_path, "w", encoding="utf-8") as f:
-            f.write(chunk)
+    # 按日期拆分，每一天作为一个任务，便于显示进度和中途取消
+    chunks = process_log.split_log_days(log_content)
+    if not chunks:
+        messagebox.showerror("错误", "未找到有效的日志内容或日期标记 (## 月.日)。")
+        return
 
-        # Step 1: Process log file
-        process_output = run_script([os.path.join(scripts_path, 'process_log.py')], status_label)
-        if process_output is None:
-            messagebox.showerror("处理失败", f"处理第 {i+1} 份报告时失败（process_log.py）。\n请检查控制台输出。")
-            continue
+    status_label.config(text="处理中，请稍候...", fg="blue")
+    start_background_job(daily_job, chunks)
 
-        # Step 2: Build report
-        build_output = run_script([os.path.join(scripts_path, 'build_report.py')], status_label)
-        if build_output is None:
-            messagebox.showerror("生成失败", f"生成第 {i+1} 份报告时失败（build_report.py）。\n请检查控制台输出。")
+def finish_daily_reports(results, cancelled):
+    """主线程：汇总每日报告的结果并反馈给用户。"""
+    project_root = get_project_root()
+    generated_reports = []
+    for i, result in enumerate(results):
+        if not result.get('ok'):
+            messagebox.showerror("生成失败", f"生成第 {i+1} 份报告时出错:\n{result.get('error')}\n\n{result.get('output', '')}")
             continue
+        generated_reports.extend(os.path.basename(path) for path in result['reports'])
 
-        match = re.search(r"-->\s*(.*\.html)", build_output)
-        if match:
-            report_path = match.group(1).strip()
-            generated_reports.append(os.path.basename(report_path))
-        else:
-            messagebox.showwarning("警告", f"第 {i+1} 份报告已处理，但无法确定报告文件名。")
+    if cancelled:
+        status_label.config(text=f"已取消，已生成 {len(generated_reports)} 份报告。{format_elapsed(results) if results else ''}", fg="orange")
+        return
             
     if not generated_reports:
         messagebox.showerror("完成", "处理完成，但没有生成任何报告。")
@@ -136,19 +188,21 @@ def generate_daily_report():
         # 如果只有一份报告，直接尝试打开它
         full_report_path = os.path.join(project_root, 'reports', generated_reports[0])
         if open_file_in_browser(full_report_path):
-            status_label.config(text=f"报告 '{generated_reports[0]}' 已生成并打开！", fg="green")
+            status_label.config(text=f"报告 '{generated_reports[0]}' 已生成并打开！{format_elapsed(results)}", fg="green")
             messagebox.showinfo("成功", f"报告 '{generated_reports[0]}' 已生成并成功在浏览器中打开！")
         else:
             messagebox.showerror("错误", f"已生成报告，但无法在浏览器中打开: {full_report_path}")
             status_label.config(text="错误：找不到报告文件。", fg="red")
     else:
         # 如果有多份报告，提示用户并询问是否打开文件夹
-        status_label.config(text=f"成功生成 {len(generated_reports)} 份报告！", fg="green")
+        status_label.config(text=f"成功生成 {len(generated_reports)} 份报告！{format_elapsed(results)}", fg="green")
         if messagebox.askyesno("全部完成", final_message + "\n\n是否打开报告所在的文件夹？"):
             reports_dir = os.path.join(project_root, 'reports')
             try:
                 os.startfile(reports_dir)
             except AttributeError: # For non-windows OS
+                import webbrowser
+
                 webbrowser.open(f"file:///{reports_dir}")
 
 def generate_periodic_report():
@@ -159,41 +213,51 @@ def generate_periodic_report():
         messagebox.showerror("错误", "请选择一个报告周期！")
         return
 
-    command_args = ['generate_periodic_report.py']
-    
     if period == 'custom':
         start_date = start_date_entry.get_date()
         end_date = end_date_entry.get_date()
         if start_date > end_date:
             messagebox.showerror("错误", "开始日期不能晚于结束日期。")
             return
-        command_args.extend(['--start', start_date.strftime('%Y-%m-%d'), '--end', end_date.strftime('%Y-%m-%d')])
+        job = {'cmd': 'period', 'start': start_date.strftime('%Y-%m-%d'), 'end': end_date.strftime('%Y-%m-%d')}
     else:
-        command_args.extend(['--period', period])
-
-    scripts_path = get_script_path()
-    project_root = os.path.abspath(os.path.join(scripts_path, os.pardir))
-
-    # 构建完整的脚本路径
-    command_with_full_path = [os.path.join(scripts_path, command_args[0])] + command_args[1:]
-
-    # Run generation script
-    output = run_script(command_with_full_path, status_label)
-
-    if output:
-        match = re.search(r"-->\s*(.*\.html)", output)
-        if match:
-            report_path = match.group(1).strip()
-            full_report_path = os.path.join(project_root, report_path)
-            if open_file_in_browser(full_report_path):
-                status_label.config(text=f"报告 '{os.path.basename(report_path)}' 已生成并打开！", fg="green")
-                messagebox.showinfo("成功", f"报告 '{os.path.basename(report_path)}' 已生成并成功在浏览器中打开！")
-            else:
-                messagebox.showerror("错误", f"找不到生成的报告文件: {full_report_path}")
-                status_label.config(text="错误：找不到报告文件。", fg="red")
+        job = {'cmd': 'period', 'period': period}
+
+    status_label.config(text="处理中，请稍候...", fg="blue")
+    start_background_job(periodic_job, job)
+
+def finish_periodic_report(result):
+    """主线程：反馈周期报告的结果。"""
+    project_root = get_project_root()
+    if not result.get('ok'):
+        messagebox.showerror("执行错误", f"生成周期报告时出错:\n{result.get('error')}\n\n{result.get('output', '')}")
+        status_label.config(text="生成报告失败，请查看错误弹窗。", fg="red")
+        return
+
+    if result['reports']:
+        report_path = result['reports'][0]
+        full_report_path = os.path.join(project_root, report_path)
+        if open_file_in_browser(full_report_path):
+            status_label.config(text=f"报告 '{os.path.basename(report_path)}' 已生成并打开！{format_elapsed([result])}", fg="green")
+            messagebox.showinfo("成功", f"报告 '{os.path.basename(report_path)}' 已生成并成功在浏览器中打开！")
         else:
-            messagebox.showerror("错误", "无法从脚本输出中找到报告文件名。")
-            status_label.config(text="错误：无法确定报告文件名。", fg="red")
+            messagebox.showerror("错误", f"找不到生成的报告文件: {full_report_path}")
+            status_label.config(text="错误：找不到报告文件。", fg="red")
+    else:
+        messagebox.showerror("错误", "指定周期内没有找到任何数据。")
+        status_label.config(text="未生成报告：周期内没有数据。", fg="orange")
+
+# 报告流程使用相对于项目根目录的路径 (data/, reports/, templates/)
+os.chdir(get_project_root())
+
+# 由本程序启动的报告常驻进程
+worker_process = None
+
+# 后台线程及其与主线程通信用的队列
+POLL_INTERVAL_MS = 100
+executor = ThreadPoolExecutor(max_workers=1)
+progress_queue = queue.Queue()
+cancel_event = threading.Event()
 
 # --- GUI 界面设置 ---
 window = tk.Tk()
@@ -214,7 +278,9 @@ instruction_label.pack(side=tk.TOP, anchor="w", pady=(0, 5))
 daily_button_frame = tk.Frame(daily_tab)
 daily_button_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=(10, 0))
 generate_daily_button = tk.Button(daily_button_frame, text="一键生成每日报告", command=generate_daily_report, font=("Microsoft YaHei", 12, "bold"))
-generate_daily_button.pack(fill=tk.X)
+cancel_button = tk.Button(daily_button_frame, text="取消", command=cancel_generation, state=tk.DISABLED, font=("Microsoft YaHei", 12))
+cancel_button.pack(side=tk.RIGHT, padx=(10, 0))
+generate_daily_button.pack(side=tk.LEFT, fill=tk.X, expand=True)
 
 text_area = scrolledtext.ScrolledText(daily_tab, wrap=tk.WORD, font=("Microsoft YaHei", 10))
 text_area.pack(fill=tk.BOTH, expand=True)
@@ -223,13 +289,8 @@ text_area.pack(fill=tk.BOTH, expand=True)
 periodic_tab = ttk.Frame(tab_control, padding=10)
 tab_control.add(periodic_tab, text='周期报告')
 
-periodic_main_frame = tk.Frame(periodic_tab)
-periodic_main_frame.pack(expand=True)
-
-periodic_label = tk.Label(periodic_main_frame, text="请选择要生成的报告周期：", font=("Microsoft YaHei", 11))
-periodic_label.pack(pady=10)
-
-period_var = tk.StringVar(value="week")
+# 周期报告页（及其依赖的 tkcalendar）在第一次切换到该页时才创建，窗口可以更快地显示出来
+generate_periodic_button = None
 
 def toggle_date_entries():
     """根据单选按钮的选择启用或禁用日期输入。"""
@@ -240,30 +301,55 @@ def toggle_date_entries():
         start_date_entry.config(state='disabled')
         end_date_entry.config(state='disabled')
 
-periods = [("本周 (Week)", "week"), ("本月 (Month)", "month"), ("最近7天 (Last 7 Days)", "last7days")]
-for text, mode in periods:
-    rb = ttk.Radiobutton(periodic_main_frame, text=text, variable=period_var, value=mode, command=toggle_date_entries)
-    rb.pack(anchor="w", padx=100, pady=5)
+def build_periodic_tab():
+    """创建周期报告页的控件。"""
+    global period_var, start_date_entry, end_date_entry, generate_periodic_button
+    from tkcalendar import DateEntry
+
+    periodic_main_frame = tk.Frame(periodic_tab)
+    periodic_main_frame.pack(expand=True)
+
+    periodic_label = tk.Label(periodic_main_frame, text="请选择要生成的报告周期：", font=("Microsoft YaHei", 11))
+    periodic_label.pack(pady=10)
+
+    period_var = tk.StringVar(value="week")
+
+    periods = [("本周 (Week)", "week"), ("本月 (Month)", "month"), ("最近7天 (Last 7 Days)", "last7days")]
+    for text, mode in periods:
+        rb = ttk.Radiobutton(periodic_main_frame, text=text, variable=period_var, value=mode, command=toggle_date_entries)
+        rb.pack(anchor="w", padx=100, pady=5)
+
+    # --- Custom Date Frame ---
+    custom_date_frame = tk.Frame(periodic_main_frame)
+    custom_rb = ttk.Radiobutton(custom_date_frame, text="自定义范围 (Custom Range)", variable=period_var, value="custom", command=toggle_date_entries)
+    custom_rb.pack(side=tk.LEFT, anchor="w")
+    custom_date_frame.pack(anchor="w", padx=100, pady=(10, 5))
+
+    date_picker_frame = tk.Frame(periodic_main_frame)
+    date_picker_frame.pack(anchor="w", padx=110, pady=5)
+
+    tk.Label(date_picker_frame, text="从:").pack(side=tk.LEFT, padx=(5,2))
+    start_date_entry = DateEntry(date_picker_frame, width=12, background='darkblue', foreground='white', borderwidth=2, date_pattern='y-mm-dd', max_date=date.today())
+    start_date_entry.pack(side=tk.LEFT)
 
-# --- Custom Date Frame ---
-custom_date_frame = tk.Frame(periodic_main_frame)
-custom_rb = ttk.Radiobutton(custom_date_frame, text="自定义范围 (Custom Range)", variable=period_var, value="custom", command=toggle_date_entries)
-custom_rb.pack(side=tk.LEFT, anchor="w")
-custom_date_frame.pack(anchor="w", padx=100, pady=(10, 5))
+    tk.Label(date_picker_frame, text="到:").pack(side=tk.LEFT, padx=(10,2))
+    end_date_entry = DateEntry(date_picker_frame, width=12, background='darkblue', foreground='white', borderwidth=2, date_pattern='y-mm-dd', max_date=date.today())
+    end_date_entry.pack(side=tk.LEFT)
 
-date_picker_frame = tk.Frame(periodic_main_frame)
-date_picker_frame.pack(anchor="w", padx=110, pady=5)
+    # 后台任务进行中时，新建的按钮与每日报告按钮保持一致的禁用状态
+    generate_periodic_button = tk.Button(periodic_main_frame, text="生成周期报告", command=generate_periodic_report,
+                                         state=generate_daily_button.cget('state'), font=("Microsoft YaHei", 12, "bold"))
+    generate_periodic_button.pack(pady=25, ipadx=20, ipady=5)
 
-tk.Label(date_picker_frame, text="从:").pack(side=tk.LEFT, padx=(5,2))
-start_date_entry = DateEntry(date_picker_frame, width=12, background='darkblue', foreground='white', borderwidth=2, date_pattern='y-mm-dd', max_date=date.today())
-start_date_entry.pack(side=tk.LEFT)
+    # Initial state for date entries
+    toggle_date_entries()
 
-tk.Label(date_picker_frame, text="到:").pack(side=tk.LEFT, padx=(10,2))
-end_date_entry = DateEntry(date_picker_frame, width=12, background='darkblue', foreground='white', borderwidth=2, date_pattern='y-mm-dd', max_date=date.today())
-end_date_entry.pack(side=tk.LEFT)
+def on_tab_changed(event):
+    """第一次切换到周期报告页时创建它的控件。"""
+    if generate_periodic_button is None and tab_control.select() == str(periodic_tab):
+        build_periodic_tab()
 
-generate_periodic_button = tk.Button(periodic_main_frame, text="生成周期报告", command=generate_periodic_report, font=("Microsoft YaHei", 12, "bold"))
-generate_periodic_button.pack(pady=25, ipadx=20, ipady=5)
+tab_control.bind("<<NotebookTabChanged>>", on_tab_changed)
 
 # --- Status Bar ---
 status_label = tk.Label(window, text="欢迎使用！请选择报告类型并开始。", bd=1, relief=tk.SUNKEN, anchor=tk.W, padx=5)
@@ -271,7 +357,7 @@ status_label.pack(side=tk.BOTTOM, fill=tk.X)
 
 # --- Initial Load of log.md ---
 try:
-    project_root_for_load = os.path.abspath(os.path.join(get_script_path(), os.pardir))
+    project_root_for_load = get_project_root()
     log_file_path_for_load = os.path.join(project_root_for_load, 'data', 'log.md')
     if os.path.exists(log_file_path_for_load):
         with open(log_file_path_for_load, 'r', encoding='utf-8') as f:
@@ -279,7 +365,9 @@ try:
 except Exception as e:
     status_label.config(text=f"加载 log.md 失败: {e}", fg="orange")
 
-# Initial state for date entries
-toggle_date_entries()
+# 窗口显示出来之后再启动报告常驻进程，在用户粘贴日志的同时完成预热。
+# 检查和启动放在后台任务线程中，不会阻塞界面；之后提交的报告任务排在它后面
+window.after_idle(lambda: executor.submit(ensure_report_worker))
+window.protocol("WM_DELETE_WINDOW", on_close)
 
 window.mainloop() 
\ No newline at end of file
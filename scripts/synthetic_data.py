@@ -0,0 +1,126 @@
+import argparse
+import datetime
+import random
+from contextlib import closing
+
+import history_store
+import process_log
+
+# 与真实日志相同的主类（带序号，用于生成日志文本）
+CATEGORIES = [('一', '杂项'), ('二', '第二类'), ('三', '娱乐'), ('四', '根源'), ('五', '第一类')]
+# 子项名只能由汉字组成（见 process_log.ITEM_PATTERN），由两个字组合出足够多的不重复名字
+ITEM_CHARS = "学工读写跑练思记画听看算修整游乐影书码琴棋茶歌舞园厨医旅购睡梦聊"
+# 任务名不能以数字结尾，否则会和后面的时长粘在一起
+TASK_NAMES = ['琐事', '阅读', '整理笔记', '作业', 'review', '写代码', '散步', '刷题', '听播客', '开会', 'vrchat', '看视频']
+
+
+def item_names(count):
+    """生成 count 个不重复的子项名。"""
+    size = len(ITEM_CHARS)
+    if count > size * size:
+        raise ValueError(f"子项数量不能超过 {size * size}")
+    return [ITEM_CHARS[i // size] + ITEM_CHARS[i % size] for i in range(count)]
+
+def day_rows(rng, items):
+    """随机生成一天的 (category, item, task, minutes) 行：items 个子项平均分配到各主类，每个子项1~2个任务。"""
+    rows = []
+    for index, item in enumerate(item_names(items)):
+        category = CATEGORIES[index % len(CATEGORIES)][1]
+        for _ in range(rng.randint(1, 2)):
+            rows.append((category, item, rng.choice(TASK_NAMES), rng.randint(5, 150)))
+    return rows
+
+def log_duration(minutes):
+    """按日志的写法格式化时长，例如 '1h30m'、'2h'、'45m'。"""
+    hours, mins = divmod(minutes, 60)
+    if hours and mins:
+        return f"{hours}h{mins}m"
+    return f"{hours}h" if hours else f"{mins}m"
+
+def timestamp_line(rng):
+    """生成一行递增的时间戳（'时.分'），与真实日志开头的时间记录格式相同。"""
+    minute = rng.randint(7 * 60, 9 * 60)
+    stamps = []
+    while minute < 24 * 60:
+        stamps.append(f"{minute // 60}.{minute % 60:02d}")
+        minute += rng.randint(5, 120)
+    return ' '.join(stamps)
+
+def day_log_text(rows, day, rng):
+    """把一天的行格式化为日志文本：日期标题、时间戳行以及 主类/子项（任务时长 ...）。"""
+    grouped = {}
+    for category, item, task, minutes in rows:
+        grouped.setdefault(category, {}).setdefault(item, []).append(f"{task}{log_duration(minutes)}")
+    numerals = {name: numeral for numeral, name in CATEGORIES}
+    lines = [f"## {day.month}.{day.day}", "", timestamp_line(rng), ""]
+    for category, items in grouped.items():
+        lines.append(f"- {numerals[category]}、{category}")
+        for item, tasks in items.items():
+            lines.append(f"    - {item}（{' '.join(tasks)}）")
+    return '\n'.join(lines) + '\n'
+
+def generate_log(days, items, end=None, seed=0):
+    """生成截止到 end（默认今天）的连续 days 天的日志文本，每天 items 个子项。"""
+    rng = random.Random(seed)
+    end = end or datetime.date.today()
+    chunks = []
+    for offset in range(days - 1, -1, -1):
+        day = end - datetime.timedelta(days=offset)
+        chunks.append(day_log_text(day_rows(rng, items), day, rng))
+    return '\n'.join(chunks)
+
+def generate_history(db_file, years, items, end=None, seed=0):
+    """
+    生成截止到 end（默认今天）的 years 年历史记录及每天的打点时间，批量写入历史库（替换库中已有的记录），
+    返回记录条数。不会从旧的CSV迁移数据。
+    """
+    rng = random.Random(seed)
+    end = end or datetime.date.today()
+    days = round(years * 365.25)
+    with closing(history_store.connect(db_file, csv_file=None)) as conn:
+        with conn:
+            conn.execute("DELETE FROM records")
+            conn.execute("DELETE FROM day_timestamps")
+            total = 0
+            for offset in range(days - 1, -1, -1):
+                date_str = (end - datetime.timedelta(days=offset)).isoformat()
+                records = [(date_str, *row) for row in day_rows(rng, items)]
+                conn.executemany(
+                    "INSERT INTO records (date, category, item, task, minutes) VALUES (?, ?, ?, ?, ?)", records
+                )
+                conn.execute("INSERT INTO day_timestamps (date, minutes) VALUES (?, ?)",
+                             (date_str, history_store.encode_minutes(process_log.parse_timestamps(timestamp_line(rng)))))
+                total += len(records)
+        history_store.rebuild_rollups(conn)
+    return total
+
+def main():
+    """命令行入口：生成合成的日志文件或历史库，用于测试和性能测试。"""
+    parser = argparse.ArgumentParser(description="生成合成的日志或历史数据。")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    log_parser = subparsers.add_parser('log', help="生成日志文本。")
+    log_parser.add_argument('--days', type=int, default=30, help="天数。")
+    log_parser.add_argument('--items', type=int, default=15, help="每天的子项数。")
+    log_parser.add_argument('--output', type=str, default='data/log.synthetic.md', help="输出文件。")
+
+    history_parser = subparsers.add_parser('history', help="生成历史库。")
+    history_parser.add_argument('--years', type=float, default=5, help="年数。")
+    history_parser.add_argument('--items', type=int, default=15, help="每天的子项数。")
+    history_parser.add_argument('--db', type=str, default='data/history.synthetic.db', help="输出的历史库文件。")
+
+    for subparser in (log_parser, history_parser):
+        subparser.add_argument('--seed', type=int, default=0, help="随机种子。")
+    args = parser.parse_args()
+
+    if args.command == 'log':
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(generate_log(args.days, args.items, seed=args.seed))
+        print(f"--> {args.output}")
+    else:
+        total = generate_history(args.db, args.years, args.items, seed=args.seed)
+        print(f"已写入 {total} 条记录。")
+        print(f"--> {args.db}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import contextlib
+import os
+
+import timing
+
+TEMPLATE_DIR = 'templates'
+REPORT_TEMPLATE = 'new_report_template.html'
+# 编译后的模板字节码缓存：新进程（命令行、批量渲染的子进程）直接加载，模板内容变化时自动重新编译
+BYTECODE_CACHE_DIR = 'data/.jinja_cache'
+
+# 进程内共享的 Environment：模板只编译一次，模板文件修改后 Jinja 会根据 mtime 自动重新加载
+_environment = None
+
+def get_environment():
+    """返回进程内共享的 Jinja Environment。"""
+    global _environment
+    if _environment is None:
+        from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+        os.makedirs(BYTECODE_CACHE_DIR, exist_ok=True)
+        _environment = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            bytecode_cache=FileSystemBytecodeCache(BYTECODE_CACHE_DIR)
+        )
+        # tojson 输出紧凑的JSON：不加多余空格，中文不转义为 \uXXXX（<>&' 仍会被转义，可以安全地嵌入 <script>）
+        _environment.policies['json.dumps_kwargs'] = {'sort_keys': True, 'separators': (',', ':'), 'ensure_ascii': False}
+    return _environment
+
+@timing.timed('加载模板')
+def get_report_template(template_file=REPORT_TEMPLATE):
+    """返回（已编译并缓存的）报告模板。"""
+    return get_environment().get_template(template_file)
+
+@timing.timed('渲染并写入报告')
+def render_to_file(template, output_file, **context):
+    """
+    把模板流式渲染到输出文件：内容边生成边写入临时文件，完成后再重命名为 output_file。
+    内存中不需要保留整份HTML；渲染中途出错时只会删除临时文件，不会留下半个报告。
+    """
+    # 临时文件名带上进程号，同时运行的多个进程写同一份报告时互不干扰
+    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            template.stream(**context).dump(f)
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_file)
+        raise
+    return output_file
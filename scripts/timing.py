@@ -0,0 +1,104 @@
+import contextlib
+import functools
+import time
+import unicodedata
+
+# 各阶段的累计耗时：{ 阶段路径(元组): [累计秒数, 次数] }，按第一次出现的顺序排列。
+# 嵌套的阶段以外层阶段为前缀，例如 ('趋势数据', '读取预聚合表')
+_stages = {}
+# 当前正在计时的阶段路径
+_current = ()
+
+
+def reset():
+    """清空已记录的耗时。"""
+    global _current
+    _stages.clear()
+    _current = ()
+
+@contextlib.contextmanager
+def stage(name):
+    """记录 with 块的耗时；同名阶段多次执行时累计耗时和次数。"""
+    global _current
+    parent = _current
+    _current = parent + (name,)
+    # 进入时就占位，保证外层阶段排在其内部阶段之前
+    entry = _stages.setdefault(_current, [0.0, 0])
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry[0] += time.perf_counter() - start
+        entry[1] += 1
+        _current = parent
+
+def timed(name):
+    """装饰器：把整个函数调用记录为一个阶段。"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def stages():
+    """返回 [(阶段路径, 累计秒数, 次数), ...]。"""
+    return [(path, seconds, count) for path, (seconds, count) in _stages.items()]
+
+def pad(text, width):
+    """按显示宽度（中文字符占两格）在右侧补齐空格。"""
+    text_width = sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in text)
+    return text + " " * max(width - text_width, 0)
+
+def format_report(total=None):
+    """格式化各阶段的耗时表；total 为总耗时（秒），用于计算占比，默认取最外层阶段之和。"""
+    entries = stages()
+    if total is None:
+        total = sum(seconds for path, seconds, _ in entries if len(path) == 1)
+    lines = ["阶段耗时:"]
+    for path, seconds, count in entries:
+        label = "  " * len(path) + path[-1]
+        share = f"{seconds / total:6.1%}" if total else ""
+        times = f"  ×{count}" if count > 1 else ""
+        lines.append(f"{pad(label, 28)}{seconds * 1000:>10.1f} ms  {share}{times}")
+    lines.append(f"{pad('总计', 28)}{total * 1000:>10.1f} ms")
+    return "\n".join(lines)
+
+def add_arguments(parser):
+    """为命令行解析器添加 --profile 和 --profile-output 参数。"""
+    parser.add_argument('--profile', action='store_true',
+                        help="运行结束后打印各阶段（解析、读写历史、数据整理、模板渲染等）的耗时。")
+    parser.add_argument('--profile-output', type=str, metavar='FILE',
+                        help="同时用 cProfile 记录函数级的耗时并保存为 pstats 文件（隐含 --profile）。")
+
+@contextlib.contextmanager
+def profiling(args):
+    """
+    根据 --profile/--profile-output 参数包裹一次命令行运行：
+    结束时打印阶段耗时，指定了 FILE 时把 cProfile 的结果写入该文件。未启用时不做任何事。
+    """
+    profile_output = getattr(args, 'profile_output', None)
+    if not (getattr(args, 'profile', False) or profile_output):
+        yield
+        return
+
+    profiler = None
+    if profile_output:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    reset()
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        total = time.perf_counter() - start
+        print(format_report(total))
+        if profiler:
+            profiler.dump_stats(profile_output)
+            print(f"cProfile 结果已保存到 '{profile_output}'，可用 python -m pstats {profile_output} 查看。")
@@ -0,0 +1,65 @@
+import os
+import random
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+
+from generate_periodic_report import prepare_stacked_bar_data  # noqa: E402
+
+DURATION_COLUMN = 'Task Duration (minutes)'
+CATEGORIES = ['第一类', '第二类', '根源', '娱乐', '杂项']
+
+
+def baseline_stacked_bar_data(df):
+    """原来的实现：对每个 (子项, 类别) 组合分别用布尔掩码筛选求和，作为对照。"""
+    y_axis_data = sorted(df['Category'].unique().tolist())
+    legend_data = sorted(df['Item'].unique().tolist())
+
+    series_data = []
+    for subcategory in legend_data:
+        series_item = {
+            "name": subcategory,
+            "type": 'bar',
+            "stack": 'total',
+            "emphasis": {"focus": "series"},
+            "data": []
+        }
+        for category in y_axis_data:
+            total_duration = df[(df['Category'] == category) & (df['Item'] == subcategory)][DURATION_COLUMN].sum()
+            series_item['data'].append(int(total_duration))
+        series_data.append(series_item)
+
+    return {
+        "yAxis": y_axis_data,
+        "legend": legend_data,
+        "series": series_data
+    }
+
+def random_frame(rng, rows, items, categorical):
+    """随机生成 Category/Item/Task/时长 记录；categorical 时把 Category 和 Item 转为分类类型（含未出现的类别）。"""
+    item_names = [f"子项{i}" for i in range(items)]
+    df = pd.DataFrame({
+        'Category': [rng.choice(CATEGORIES) for _ in range(rows)],
+        'Item': [rng.choice(item_names) for _ in range(rows)],
+        'Task': [f"任务{rng.randint(0, 20)}" for _ in range(rows)],
+        DURATION_COLUMN: [rng.randint(1, 300) for _ in range(rows)],
+    })
+    if categorical:
+        df['Category'] = pd.Categorical(df['Category'], categories=CATEGORIES + ['未使用'])
+        df['Item'] = pd.Categorical(df['Item'], categories=item_names + ['未使用的子项'])
+    return df
+
+@pytest.mark.parametrize('categorical', [False, True])
+@pytest.mark.parametrize('seed', range(15))
+def test_matches_baseline(seed, categorical):
+    rng = random.Random(seed)
+    df = random_frame(rng, rng.randint(1, 3000), rng.randint(1, 80), categorical)
+    assert prepare_stacked_bar_data(df) == baseline_stacked_bar_data(df)
+
+def test_values_are_plain_ints():
+    df = random_frame(random.Random(0), 200, 10, categorical=False)
+    result = prepare_stacked_bar_data(df)
+    assert all(type(value) is int for series in result['series'] for value in series['data'])